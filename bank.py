@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+"""预生成题库：去重后的题目/答案语料 + 定长偏移索引，支持按索引随机抽题
+
+    <prefix>.dat  每行一条记录 "题目\\t答案"
+    <prefix>.idx  文件头（魔数 + 记录数）后接定长记录：
+                  数据偏移(8) 长度(4) 所需最小数值范围(4) 运算符个数(1)
+
+抽题时只读取被抽中的索引项与数据行，耗时与抽取数量成正比，与题库大小无关。
+"""
+import argparse
+import random
+import struct
+import sys
+from typing import Iterator, List, Optional, Tuple
+from lexer import DEFAULT_MAX_OPERATORS, MAX_OPERATORS, PRIORITY, count_operators, tokenize
+from fraction import parse_fraction
+from stats import GenerationStats
+from utils import generate_exercises, save_to_file
+
+INDEX_MAGIC = b'CALCIDX1'
+_HEADER = struct.Struct('<8sQ')
+_RECORD = struct.Struct('<QIIB')
+
+# 带筛选条件抽题时，随机探测次数超过 n * MAX_PROBE_FACTOR 后改为扫描全部索引
+MAX_PROBE_FACTOR = 50
+
+
+class BankEntry:
+    """索引中的一条记录"""
+
+    __slots__ = ('offset', 'length', 'min_range', 'operators')
+
+    def __init__(self, offset: int, length: int, min_range: int, operators: int):
+        self.offset = offset
+        self.length = length
+        self.min_range = min_range
+        self.operators = operators
+
+    def matches(self, operators: Optional[int], max_range: Optional[int],
+                max_operators: Optional[int] = None) -> bool:
+        if operators is not None and self.operators != operators:
+            return False
+        if max_operators is not None and self.operators > max_operators:
+            return False
+        if max_range is not None and self.min_range > max_range:
+            return False
+        return True
+
+
+def _min_range(tokens) -> int:
+    """表达式在 -r 取多少时才可能生成（整数 n 需 r > n，真分数 a/b 需 r >= b）"""
+    needed = 1
+    for token in tokens:
+        if token in PRIORITY or token in '()':
+            continue
+        if "'" in token:
+            whole, rest = token.split("'", 1)
+            needed = max(needed, int(whole) + 1, int(rest.split('/')[1]))
+        elif '/' in token:
+            needed = max(needed, parse_fraction(token)[1])
+        else:
+            needed = max(needed, int(token) + 1)
+    return needed
+
+
+def write_bank(exercises: List[Tuple[str, str]], prefix: str):
+    """写出数据文件与定长索引"""
+    with open(f"{prefix}.dat", 'wb') as data, open(f"{prefix}.idx", 'wb') as index:
+        index.write(_HEADER.pack(INDEX_MAGIC, len(exercises)))
+        offset = 0
+        for exercise, answer in exercises:
+            record = f"{exercise}\t{answer}\n".encode('utf-8')
+            tokens = tokenize(exercise.split('=')[0])
+            index.write(_RECORD.pack(offset, len(record), _min_range(tokens), count_operators(tokens)))
+            data.write(record)
+            offset += len(record)
+
+
+def build_bank(count: int, max_range: int, prefix: str, seed: Optional[int] = None, workers: int = 1,
+               stats: Optional[GenerationStats] = None, max_operators: int = DEFAULT_MAX_OPERATORS) -> int:
+    """生成去重题库并写出，返回实际写入的题目数"""
+    exercises = generate_exercises(count, max_range, stats, workers, seed, max_operators=max_operators)
+    write_bank(exercises, prefix)
+    return len(exercises)
+
+
+class ExerciseBank:
+    """按偏移索引随机访问的题库"""
+
+    def __init__(self, prefix: str):
+        self._index = open(f"{prefix}.idx", 'rb')
+        self._data = open(f"{prefix}.dat", 'rb')
+        magic, self.size = _HEADER.unpack(self._index.read(_HEADER.size))
+        if magic != INDEX_MAGIC:
+            self.close()
+            raise ValueError(f"无效的题库索引: {prefix}.idx")
+
+    def close(self):
+        self._index.close()
+        self._data.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self) -> int:
+        return self.size
+
+    def entry(self, i: int) -> BankEntry:
+        self._index.seek(_HEADER.size + i * _RECORD.size)
+        return BankEntry(*_RECORD.unpack(self._index.read(_RECORD.size)))
+
+    def _entries(self) -> Iterator[Tuple[int, BankEntry]]:
+        self._index.seek(_HEADER.size)
+        for i in range(self.size):
+            yield i, BankEntry(*_RECORD.unpack(self._index.read(_RECORD.size)))
+
+    def read(self, entry: BankEntry) -> Tuple[str, str]:
+        self._data.seek(entry.offset)
+        exercise, answer = self._data.read(entry.length).decode('utf-8').rstrip('\n').split('\t')
+        return exercise, answer
+
+    def sample(self, n: int, rng=None, operators: Optional[int] = None,
+               max_range: Optional[int] = None, max_operators: Optional[int] = None) -> List[Tuple[str, str]]:
+        """不放回地随机抽取 n 道题，可按运算符个数（恰好 operators 个或不超过 max_operators 个）与数值范围筛选
+
+        先随机探测索引项，命中率过低时才退回全量扫描索引。
+        """
+        if rng is None:
+            rng = random
+        if operators is None and max_range is None and max_operators is None:
+            return [self.read(self.entry(i)) for i in rng.sample(range(self.size), min(n, self.size))]
+
+        chosen: List[BankEntry] = []
+        probed = set()
+        max_probes = min(self.size, n * MAX_PROBE_FACTOR)
+        while len(chosen) < n and len(probed) < max_probes:
+            i = rng.randrange(self.size)
+            if i in probed:
+                continue
+            probed.add(i)
+            entry = self.entry(i)
+            if entry.matches(operators, max_range, max_operators):
+                chosen.append(entry)
+
+        if len(chosen) < n and len(probed) < self.size:
+            # 筛选条件过严：扫描全部索引后再从剩余匹配项中抽取
+            rest = [entry for i, entry in self._entries()
+                    if i not in probed and entry.matches(operators, max_range, max_operators)]
+            chosen.extend(rng.sample(rest, min(n - len(chosen), len(rest))))
+
+        return [self.read(entry) for entry in chosen]
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description='预生成题库的构建与抽题')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    build = sub.add_parser('build', help='生成题库')
+    build.add_argument('-n', type=int, required=True, help='题库题目数量')
+    build.add_argument('-r', type=int, required=True, help='数值范围')
+    build.add_argument('--bank', type=str, default='bank', help='题库文件前缀')
+    build.add_argument('--seed', type=int, help='随机种子')
+    build.add_argument('--workers', type=int, default=1, help='生成题目的线程数')
+    build.add_argument('--max-operators', type=int, default=DEFAULT_MAX_OPERATORS, choices=range(1, MAX_OPERATORS + 1),
+                       metavar=f'1~{MAX_OPERATORS}', help='每道题的运算符个数上限')
+
+    sample = sub.add_parser('sample', help='从题库抽题')
+    sample.add_argument('-n', type=int, required=True, help='抽取数量')
+    sample.add_argument('--bank', type=str, default='bank', help='题库文件前缀')
+    sample.add_argument('-r', type=int, help='只抽取数值范围不超过 r 的题目')
+    sample.add_argument('--operators', type=int, help='只抽取指定运算符个数的题目')
+    sample.add_argument('--max-operators', type=int, help='只抽取运算符个数不超过该值的题目')
+    sample.add_argument('--seed', type=int, help='随机种子')
+
+    args = parser.parse_args(argv)
+
+    if args.command == 'build':
+        written = build_bank(args.n, args.r, args.bank, args.seed, args.workers, max_operators=args.max_operators)
+        print(f"题库已保存到 {args.bank}.dat / {args.bank}.idx，共 {written} 个题目")
+        return 0
+
+    with ExerciseBank(args.bank) as bank:
+        rng = random.Random(args.seed) if args.seed is not None else None
+        exercises = bank.sample(args.n, rng, args.operators, args.r, args.max_operators)
+    if len(exercises) < args.n:
+        print(f"警告: 题库中符合条件的题目只有 {len(exercises)} 个")
+    save_to_file([ex[0] for ex in exercises], "Exercises.txt")
+    save_to_file([ex[1] for ex in exercises], "Answers.txt")
+    print("题目已保存到 Exercises.txt")
+    print("答案已保存到 Answers.txt")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,425 @@
+#!/usr/bin/env python3
+"""性能基准测试：固定随机种子，记录吞吐量、延迟分位数和峰值内存，并与基线比较"""
+import argparse
+import atexit
+import itertools
+import json
+import os
+import random
+import re
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Callable, Dict, Iterable, List, Tuple
+from expression import Expression
+from validator import ExpressionValidator
+from grader import ExerciseGrader
+from numeric import BACKENDS, get_backend, set_default_backend
+from lexer import DEFAULT_MAX_OPERATORS
+from memo import DEFAULT_MEMO_SIZE
+
+# 预生成表达式池的上限，超过该规模时循环复用，避免准备阶段耗时过长
+POOL_LIMIT = 100000
+# 单个场景每一轮最多保留的延迟样本数
+MAX_LATENCY_SAMPLES = 100000
+# 预热轮的规模上限（预热不计时，只用于排除导入、缓存填充等一次性开销）
+WARMUP_COUNT = 1000
+# 每个场景至少计时的轮数，结果取各轮耗时的中位数
+DEFAULT_REPEAT = 3
+# 各轮累计计时不足该秒数时继续追加轮次（最多 MAX_PASSES 轮），短于该时长的结果不参与吞吐量退化判断
+MIN_DURATION = 0.2
+MAX_PASSES = 50
+# 批改场景中每个题目文件的行数
+GRADE_CHUNK = 1000
+# 流水线批改场景的求值线程数与块大小
+PIPELINE_WORKERS = 1
+PIPELINE_CHUNK = 250
+
+SUITES = {
+    'quick': {'scales': [1000, 10000], 'ranges': [10, 100]},
+    'full': {'scales': [1000, 10000, 100000, 1000000, 10000000], 'ranges': [10, 100, 1000]},
+}
+
+
+def _build_pool(count: int, max_range: int, seed: int,
+                max_operators: int = DEFAULT_MAX_OPERATORS) -> List[Tuple[str, object]]:
+    """用固定种子预生成表达式池"""
+    random.seed(seed)
+    expression_gen = Expression()
+    return [expression_gen.generate_expression(max_range, max_operators) for _ in range(min(count, POOL_LIMIT))]
+
+
+def _cycle(pool: list, count: int) -> Iterable:
+    return itertools.islice(itertools.cycle(pool), count)
+
+
+_FIRST_INTEGER = re.compile(r"\d+")
+
+
+def _distinct_cycle(pool: List[str], count: int, max_range: int) -> List[str]:
+    """循环复用表达式池，第 k 轮（k >= 1）把首个操作数的整数部分加上 k × 10^位数，
+
+    使各轮的查重键互不相同，规模超过 POOL_LIMIT 时查重场景测的仍是插入而不只是命中。
+    """
+    step = 10 ** len(str(max_range))
+    items = list(itertools.islice(pool, count))
+    for k in range(1, -(-count // len(pool)) if pool else 0):
+        shift = k * step
+        for expr in itertools.islice(pool, count - len(items)):
+            items.append(_FIRST_INTEGER.sub(lambda m: str(int(m.group()) + shift), expr, count=1))
+    return items
+
+
+def setup_fraction(count: int, max_range: int, seed: int, max_operators: int = DEFAULT_MAX_OPERATORS):
+    """分数四则运算（使用当前数值后端）"""
+    random.seed(seed)
+    numeric = get_backend()
+    pairs = [(numeric.random(max_range), numeric.random(max_range))
+             for _ in range(min(count, POOL_LIMIT))]
+    add, sub, mul, div, is_zero = numeric.add, numeric.sub, numeric.mul, numeric.div, numeric.is_zero
+
+    def run(pair):
+        a, b = pair
+        add(a, b)
+        sub(a, b)
+        mul(a, b)
+        if not is_zero(b):
+            div(a, b)
+
+    return run, _cycle(pairs, count), 1
+
+
+def setup_generate(count: int, max_range: int, seed: int, max_operators: int = DEFAULT_MAX_OPERATORS):
+    """单个表达式生成"""
+    random.seed(seed)
+    expression_gen = Expression()
+
+    def run(_):
+        expression_gen.generate_expression(max_range, max_operators)
+
+    return run, range(count), 1
+
+
+def setup_evaluate(count: int, max_range: int, seed: int, max_operators: int = DEFAULT_MAX_OPERATORS):
+    """表达式求值"""
+    pool = [expr for expr, _ in _build_pool(count, max_range, seed, max_operators)]
+    expression_gen = Expression()
+    return expression_gen.evaluate_expression, _cycle(pool, count), 1
+
+
+def setup_evaluate_memo(count: int, max_range: int, seed: int, max_operators: int = DEFAULT_MAX_OPERATORS):
+    """表达式求值（开启 --memo-size 时的配置；规模不超过 POOL_LIMIT 时只有公共子表达式能命中）"""
+    pool = [expr for expr, _ in _build_pool(count, max_range, seed, max_operators)]
+    expression_gen = Expression(memo_size=DEFAULT_MEMO_SIZE)
+    return expression_gen.evaluate_expression, _cycle(pool, count), 1
+
+
+def setup_dedup(count: int, max_range: int, seed: int, max_operators: int = DEFAULT_MAX_OPERATORS):
+    """查重（规范化 + 集合查询/插入）"""
+    pool = [expr for expr, _ in _build_pool(count, max_range, seed, max_operators)]
+    validator = ExpressionValidator()
+    return validator.try_add, _distinct_cycle(pool, count, max_range), 1
+
+
+def _write_grade_files(count: int, max_range: int, seed: int, max_operators: int) -> Tuple[str, str, int]:
+    """写出一组 GRADE_CHUNK 行以内的题目/答案文件，返回 (题目文件, 答案文件, 行数)"""
+    pool = _build_pool(min(count, GRADE_CHUNK), max_range, seed, max_operators)
+    chunk = min(count, GRADE_CHUNK)
+    tmp_dir = tempfile.mkdtemp(prefix='calculate_bench_')
+    atexit.register(shutil.rmtree, tmp_dir, True)
+    ex_file = os.path.join(tmp_dir, 'Exercises.txt')
+    ans_file = os.path.join(tmp_dir, 'Answers.txt')
+    with open(ex_file, 'w', encoding='utf-8') as f:
+        for expr, _ in _cycle(pool, chunk):
+            f.write(f"{expr} = \n")
+    with open(ans_file, 'w', encoding='utf-8') as f:
+        for _, result in _cycle(pool, chunk):
+            f.write(get_backend().to_string(result) + '\n')
+    return ex_file, ans_file, chunk
+
+
+def setup_grade(count: int, max_range: int, seed: int, max_operators: int = DEFAULT_MAX_OPERATORS):
+    """批改（按文件分块，每个文件计 GRADE_CHUNK 道题）"""
+    ex_file, ans_file, chunk = _write_grade_files(count, max_range, seed, max_operators)
+    grader = ExerciseGrader(numeric_backend=get_backend().name)
+
+    def run(_):
+        grader.grade_exercises(ex_file, ans_file)
+
+    return run, range(max(1, count // chunk)), chunk
+
+
+def setup_grade_pipelined(count: int, max_range: int, seed: int, max_operators: int = DEFAULT_MAX_OPERATORS):
+    """流水线批改（同 grade_exercises 的文件，所有文件交给一条流水线）"""
+    ex_file, ans_file, chunk = _write_grade_files(count, max_range, seed, max_operators)
+    grader = ExerciseGrader(numeric_backend=get_backend().name)
+    files = [(ex_file, ans_file)] * max(1, count // chunk)
+
+    def run(_):
+        grader.grade_files_pipelined(files, workers=PIPELINE_WORKERS, chunk_size=PIPELINE_CHUNK)
+
+    return run, range(1), chunk * len(files)
+
+
+SCENARIOS: Dict[str, Callable] = {
+    'fraction_arith': setup_fraction,
+    'generate_expression': setup_generate,
+    'evaluate_expression': setup_evaluate,
+    'evaluate_memo': setup_evaluate_memo,
+    'dedup': setup_dedup,
+    'grade_exercises': setup_grade,
+    'grade_pipelined': setup_grade_pipelined,
+}
+
+
+def _percentile(sorted_values: List[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def run_scenario(name: str, count: int, max_range: int, seed: int, measure_memory: bool = True,
+                 backend: str = 'fraction', max_operators: int = DEFAULT_MAX_OPERATORS,
+                 repeat: int = DEFAULT_REPEAT, min_duration: float = MIN_DURATION) -> Dict:
+    """运行单个场景，返回吞吐量、延迟分位数（微秒）和峰值内存（字节）
+
+    先做一轮不计时的小规模预热，再计时至少 repeat 轮（累计不足 min_duration 秒时追加），
+    吞吐量按各轮耗时的中位数计算。
+    """
+    previous = get_backend().name
+    set_default_backend(backend)
+    try:
+        result = _run_scenario(name, count, max_range, seed, measure_memory, max_operators, repeat, min_duration)
+    finally:
+        set_default_backend(previous)
+    result['backend'] = backend
+    result['max_operators'] = max_operators
+    return result
+
+
+def _run_scenario(name: str, count: int, max_range: int, seed: int, measure_memory: bool,
+                  max_operators: int, repeat: int, min_duration: float) -> Dict:
+    setup = SCENARIOS[name]
+    func, items, _ = setup(min(count, WARMUP_COUNT), max_range, seed, max_operators)
+    for item in items:
+        func(item)
+
+    latencies = []
+    durations = []
+    perf_counter = time.perf_counter
+    while len(durations) < repeat or (sum(durations) < min_duration and len(durations) < MAX_PASSES):
+        # 每轮重新准备，查重集合、缓存等状态不会跨轮累积
+        func, items, units = setup(count, max_range, seed, max_operators)
+        sample_every = max(1, count // units // MAX_LATENCY_SAMPLES)
+
+        ops = 0
+        start = perf_counter()
+        for i, item in enumerate(items):
+            if i % sample_every == 0:
+                t0 = perf_counter()
+                func(item)
+                latencies.append((perf_counter() - t0) * 1e6)
+            else:
+                func(item)
+            ops += units
+        durations.append(perf_counter() - start)
+    elapsed = statistics.median(durations)
+
+    peak_memory = None
+    if measure_memory:
+        # 内存单独测一遍，避免 tracemalloc 的开销影响计时
+        func, items, _ = setup(count, max_range, seed, max_operators)
+        tracemalloc.start()
+        try:
+            for item in items:
+                func(item)
+            _, peak_memory = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+    latencies.sort()
+    return {
+        'scenario': name,
+        'count': count,
+        'range': max_range,
+        'seed': seed,
+        'ops': ops,
+        'elapsed_s': elapsed,
+        'passes': len(durations),
+        'measured_s': sum(durations),
+        'throughput_ops_s': ops / elapsed if elapsed > 0 else 0.0,
+        'latency_us': {
+            'p50': _percentile(latencies, 50),
+            'p90': _percentile(latencies, 90),
+            'p99': _percentile(latencies, 99),
+            'max': latencies[-1] if latencies else 0.0,
+        },
+        'peak_memory_bytes': peak_memory,
+    }
+
+
+def _workload(result: Dict) -> str:
+    """场景与规模（运算符上限为默认值时省略，与旧基线的键保持一致）"""
+    workload = f"{result['scenario']}@n={result['count']},r={result['range']}"
+    max_operators = result.get('max_operators', DEFAULT_MAX_OPERATORS)
+    if max_operators != DEFAULT_MAX_OPERATORS:
+        workload += f",m={max_operators}"
+    return workload
+
+
+def result_key(result: Dict) -> str:
+    scenario, scale = _workload(result).split('@', 1)
+    return f"{scenario}[{result.get('backend', 'fraction')}]@{scale}"
+
+
+def backend_winners(results: List[Dict]) -> Dict[str, str]:
+    """按场景与规模找出吞吐量最高的数值后端"""
+    best: Dict[str, Dict] = {}
+    for result in results:
+        workload = _workload(result)
+        if workload not in best or result['throughput_ops_s'] > best[workload]['throughput_ops_s']:
+            best[workload] = result
+    return {workload: result.get('backend', 'fraction') for workload, result in best.items()}
+
+
+def scaling_curve(results: List[Dict]) -> Dict[str, List[Tuple[int, float]]]:
+    """按场景、规模与后端整理每道题耗时（微秒）随运算符上限变化的曲线"""
+    curves: Dict[str, List[Tuple[int, float]]] = {}
+    for result in results:
+        key = f"{result['scenario']}[{result.get('backend', 'fraction')}]@n={result['count']},r={result['range']}"
+        throughput = result['throughput_ops_s']
+        per_item = 1e6 / throughput if throughput > 0 else 0.0
+        curves.setdefault(key, []).append((result.get('max_operators', DEFAULT_MAX_OPERATORS), per_item))
+    return {key: sorted(points) for key, points in curves.items()}
+
+
+def _measured_enough(result: Dict, min_duration: float) -> bool:
+    """累计计时是否足以比较吞吐量（旧格式的结果没有 measured_s，视为足够）"""
+    measured = result.get('measured_s')
+    return measured is None or measured >= min_duration
+
+
+def compare_results(current: List[Dict], baseline: List[Dict], threshold: float,
+                    min_duration: float = MIN_DURATION) -> List[str]:
+    """与基线比较，返回超出阈值的退化描述（吞吐量下降或峰值内存上升）
+
+    任一方累计计时不足 min_duration 秒时不比较吞吐量，避免把计时噪声当作退化。
+    """
+    baseline_map = {result_key(r): r for r in baseline}
+    regressions = []
+    for result in current:
+        key = result_key(result)
+        base = baseline_map.get(key)
+        if base is None:
+            continue
+
+        base_tp = base.get('throughput_ops_s') or 0.0
+        comparable = _measured_enough(result, min_duration) and _measured_enough(base, min_duration)
+        if comparable and base_tp > 0 and result['throughput_ops_s'] < base_tp * (1 - threshold):
+            regressions.append(
+                f"{key}: 吞吐量 {result['throughput_ops_s']:.1f} ops/s 低于基线 {base_tp:.1f} ops/s"
+            )
+
+        base_mem = base.get('peak_memory_bytes')
+        cur_mem = result.get('peak_memory_bytes')
+        if base_mem and cur_mem is not None and cur_mem > base_mem * (1 + threshold):
+            regressions.append(
+                f"{key}: 峰值内存 {cur_mem} 字节高于基线 {base_mem} 字节"
+            )
+    return regressions
+
+
+def parse_arguments(argv=None):
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(description='四则运算题目生成器性能基准测试')
+    parser.add_argument('--suite', choices=sorted(SUITES), default='quick', help='预设的规模组合')
+    parser.add_argument('--scales', type=str, help='逗号分隔的题目规模，如 1e3,1e5（覆盖 --suite）')
+    parser.add_argument('--ranges', type=str, help='逗号分隔的 -r 取值（覆盖 --suite）')
+    parser.add_argument('--scenarios', type=str, help=f"逗号分隔的场景名，可选: {', '.join(SCENARIOS)}")
+    parser.add_argument('--backends', type=str, default='fraction',
+                        help=f"逗号分隔的数值后端，可选: {', '.join(BACKENDS)}")
+    parser.add_argument('--operators', type=str, default=str(DEFAULT_MAX_OPERATORS),
+                        help='逗号分隔的运算符上限，如 1,2,4,6,8,10（多个取值时输出扩展曲线）')
+    parser.add_argument('--seed', type=int, default=2024, help='随机种子')
+    parser.add_argument('--output', type=str, default='benchmark_results.json', help='结果 JSON 文件')
+    parser.add_argument('--baseline', type=str, help='基线 JSON 文件')
+    parser.add_argument('--save-baseline', action='store_true', help='将本次结果写入 --baseline 文件')
+    parser.add_argument('--threshold', type=float, default=0.2, help='允许的退化比例（默认 0.2 即 20%%）')
+    parser.add_argument('--no-memory', action='store_true', help='跳过峰值内存测量')
+    parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT, help='每个场景至少计时的轮数（取中位数）')
+    parser.add_argument('--min-duration', type=float, default=MIN_DURATION,
+                        help='每个场景累计计时的最短秒数，不足时追加轮次；更短的结果不参与吞吐量比较')
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_arguments(argv)
+    suite = SUITES[args.suite]
+    scales = [int(float(s)) for s in args.scales.split(',')] if args.scales else suite['scales']
+    ranges = [int(r) for r in args.ranges.split(',')] if args.ranges else suite['ranges']
+    names = args.scenarios.split(',') if args.scenarios else list(SCENARIOS)
+    backends = args.backends.split(',')
+    operator_limits = [int(m) for m in args.operators.split(',')]
+    for backend in backends:
+        if backend not in BACKENDS:
+            print(f"未知后端: {backend}")
+            return 2
+
+    results = []
+    for name in names:
+        if name not in SCENARIOS:
+            print(f"未知场景: {name}")
+            return 2
+        for count in scales:
+            for max_range in ranges:
+                for backend in backends:
+                    for max_operators in operator_limits:
+                        result = run_scenario(name, count, max_range, args.seed, not args.no_memory, backend,
+                                              max_operators, args.repeat, args.min_duration)
+                        results.append(result)
+                        print(f"{result_key(result)}: {result['throughput_ops_s']:.1f} ops/s, "
+                              f"p50={result['latency_us']['p50']:.1f}us p99={result['latency_us']['p99']:.1f}us, "
+                              f"peak={result['peak_memory_bytes']}")
+
+    if len(backends) > 1:
+        print("各场景吞吐量最高的后端:")
+        for workload, backend in backend_winners(results).items():
+            print(f"  {workload}: {backend}")
+
+    if len(operator_limits) > 1:
+        print("每题耗时随运算符上限的变化（括号内为相对最小上限的倍数）:")
+        for key, points in scaling_curve(results).items():
+            base = points[0][1] or 1.0
+            print(f"  {key}: " + ", ".join(f"m={m} {us:.1f}us ({us / base:.2f}x)" for m, us in points))
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+    print(f"结果已保存到 {args.output}")
+
+    if not args.baseline:
+        return 0
+
+    if args.save_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"基线已保存到 {args.baseline}")
+        return 0
+
+    with open(args.baseline, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)
+    regressions = compare_results(results, baseline, args.threshold, args.min_duration)
+    if regressions:
+        print("检测到性能退化:")
+        for line in regressions:
+            print(f"  {line}")
+        return 1
+    print("未检测到超出阈值的性能退化")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
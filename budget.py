@@ -0,0 +1,88 @@
+import math
+import time
+from typing import Optional
+
+
+class GenerationBudget:
+    """题目生成预算：时间期限、随接受率自适应的尝试上限与查重饱和检测
+
+    每 window 次尝试根据该窗口内的接受率重新估算完成剩余题目所需的尝试次数，
+    上限取 min(固定上限, 已尝试 + slack × 估算值)。
+    接受率低并不代表饱和：只有连续 patience 个窗口内通过校验的候选几乎全是重复（比例不低于 saturation）时，
+    才认为题目空间已饱和并提前停止，返回已生成的部分结果。
+    单个题目在生成器的尝试上限内都无法生成时（通常是数值范围过小），停止原因为 exhausted。
+    """
+
+    ATTEMPTS = 'attempts'
+    DEADLINE = 'deadline'
+    SATURATED = 'saturated'
+    EXHAUSTED = 'exhausted'
+
+    def __init__(self, target: int, time_budget: Optional[float] = None, max_attempts: Optional[int] = None,
+                 window: int = 500, slack: float = 4.0, saturation: float = 0.999, patience: int = 20):
+        self.target = target
+        self.hard_limit = max_attempts if max_attempts is not None else target * 200
+        self.limit = self.hard_limit
+        self.deadline = time.perf_counter() + time_budget if time_budget is not None else None
+        self.window = window
+        self.slack = slack
+        self.saturation = saturation
+        self.patience = patience
+
+        self.attempts = 0
+        self.accepted = 0
+        self.stop_reason: Optional[str] = None
+        self._window_attempts = 0
+        self._window_accepted = 0
+        self._window_duplicates = 0
+        self._saturated_windows = 0
+
+    def record(self, accepted: bool = False, duplicate: bool = False, count: int = 1):
+        """记录 count 次结果相同的尝试"""
+        self.attempts += count
+        self._window_attempts += count
+        if accepted:
+            self.accepted += count
+            self._window_accepted += count
+        elif duplicate:
+            self._window_duplicates += count
+        if self._window_attempts >= self.window:
+            self._adapt()
+
+    def _adapt(self):
+        candidates = self._window_accepted + self._window_duplicates
+        if candidates and self._window_duplicates / candidates >= self.saturation:
+            self._saturated_windows += 1
+        else:
+            self._saturated_windows = 0
+        if self._saturated_windows >= self.patience:
+            self.stop_reason = self.SATURATED
+        elif self._window_accepted:
+            rate = self._window_accepted / self._window_attempts
+            remaining = self.target - self.accepted
+            self.limit = min(self.hard_limit, self.attempts + math.ceil(self.slack * remaining / rate))
+        else:
+            self.limit = self.hard_limit
+        self._window_attempts = self._window_accepted = self._window_duplicates = 0
+
+    def give_up(self):
+        """生成器已无法产出候选（期限已到或单次生成超出尝试上限）时停止"""
+        if self.deadline is not None and time.perf_counter() >= self.deadline:
+            self.stop_reason = self.DEADLINE
+        else:
+            self.stop_reason = self.EXHAUSTED
+
+    def remaining_attempts(self) -> int:
+        return max(0, self.limit - self.attempts)
+
+    def exhausted(self) -> bool:
+        """是否应停止生成（已完成时 stop_reason 为 None）"""
+        if self.accepted >= self.target or self.stop_reason is not None:
+            return True
+        if self.attempts >= self.limit:
+            self.stop_reason = self.ATTEMPTS
+            return True
+        if self.deadline is not None and time.perf_counter() >= self.deadline:
+            self.stop_reason = self.DEADLINE
+            return True
+        return False
@@ -1,94 +1,171 @@
 import random
-from typing import List, Tuple
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
 from fraction import Fraction
+from stats import GenerationStats
+from lexer import DEFAULT_MAX_OPERATORS, OPERATORS, PRIORITY, main_operator, tokenize
+from numeric import NumericBackend, get_backend
+from memo import MemoCache
+
+
+class ConstraintError(ValueError):
+    """子表达式违反生成约束，reason 为 GenerationStats 中的拒绝原因"""
+
+    def __init__(self, reason: str, message: str):
+        super().__init__(message)
+        self.reason = reason
+
+
+class GenerationExhausted(RuntimeError):
+    """在尝试次数或时间期限内未能生成符合约束的表达式"""
+
+
+# generate_expression 单次调用内的默认尝试上限
+DEFAULT_MAX_ATTEMPTS = 10000
+
+# memo 只缓存不超过该记号数的括号子表达式：键需要切片并哈希，
+# 不设上限时深层嵌套的总开销为 O(长度 × 深度)
+MEMO_MAX_TOKENS = 64
 
 
 class Expression:
-    def __init__(self):
-        self.operators = ['+', '-', '×', '÷']
-        self.priority = {'+': 1, '-': 1, '×': 2, '÷': 2}
+    """表达式生成与求值
 
-    def generate_expression(self, max_range: int, max_operators: int = 3) -> Tuple[str, Fraction]:
-        """生成表达式和结果（确保所有子步骤符合约束）"""
-        while True:
+    rng 为该实例专用的 random.Random，缺省时使用全局 random 模块。
+    backend 为数值后端（见 numeric 模块），缺省时使用启动时选定的默认后端，
+    生成与求值得到的值均为该后端的类型。
+    memo_size 为求值子表达式 LRU 缓存（memo）的容量，默认 0 即关闭缓存。
+    生成时实例会修改自身的 stats，线程池中应为每个线程创建独立实例；求值只读写加锁的 memo，可以共享。
+    """
+
+    def __init__(self, stats: Optional[GenerationStats] = None, rng: Optional[random.Random] = None,
+                 backend: Optional[NumericBackend] = None, memo_size: int = 0):
+        self.operators = list(OPERATORS)
+        self.priority = dict(PRIORITY)
+        self.stats = stats if stats is not None else GenerationStats()
+        self.rng = rng if rng is not None else random
+        self.backend = backend if backend is not None else get_backend()
+        self.memo = MemoCache(memo_size) if memo_size > 0 else None
+
+    def generate_expression(self, max_range: int, max_operators: int = DEFAULT_MAX_OPERATORS,
+                            max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+                            deadline: Optional[float] = None) -> Tuple[str, Fraction]:
+        """生成表达式和结果（确保所有子步骤符合约束）
+
+        最多尝试 max_attempts 次；deadline 为 time.perf_counter() 时刻。
+        超出任一限制时抛出 GenerationExhausted。
+        """
+        stats = self.stats
+        rng = self.rng
+        perf_counter = time.perf_counter
+        for _ in range(max_attempts):
+            stats.attempts += 1
+            start = perf_counter()
+            if deadline is not None and start >= deadline:
+                raise GenerationExhausted("已超过生成期限")
             try:
-                num_operators = random.randint(1, max_operators)
+                num_operators = rng.randint(1, max_operators)
                 num_operands = num_operators + 1
 
                 # 生成操作数
-                operands = [Fraction.random_fraction(max_range) for _ in range(num_operands)]
+                operands = [self.backend.random(max_range, rng) for _ in range(num_operands)]
 
                 # 生成运算符
-                operators = [random.choice(self.operators) for _ in range(num_operators)]
+                operators = [rng.choice(self.operators) for _ in range(num_operators)]
 
                 # 构建表达式树（带中间结果校验）
                 expr_str, result = self._build_expression(operands, operators)
-
-                # 最终验证
-                if self._is_valid_expression(expr_str, result):
-                    return expr_str, result
-            except (ValueError, ZeroDivisionError):
+            except ConstraintError as e:
+                stats.reject(e.reason)
                 continue
+            except ZeroDivisionError:
+                stats.reject(GenerationStats.ZERO_DIVISOR)
+                continue
+            except ValueError:
+                # 例如 -r 过小导致无法生成操作数
+                stats.reject(GenerationStats.INVALID_OPERAND)
+                continue
+            finally:
+                stats.add_time('build', perf_counter() - start)
 
-    def _build_expression(self, operands: List[Fraction], operators: List[str]) -> Tuple[str, Fraction]:
-        """构建表达式树（递归检查所有子表达式约束）"""
-        if len(operands) == 1:
-            return operands[0].to_string(), operands[0]
+            # 最终验证
+            start = perf_counter()
+            valid = self._is_valid_expression(expr_str, result)
+            stats.add_time('validate', perf_counter() - start)
+            if valid:
+                return expr_str, result
+            if self.backend.is_negative(result):
+                stats.reject(GenerationStats.NEGATIVE_SUBTRACTION)
+            else:
+                stats.reject(GenerationStats.IMPROPER_QUOTIENT)
 
-        # 随机选择分割点
-        split_point = random.randint(1, len(operands) - 1)
+        raise GenerationExhausted(f"{max_attempts} 次尝试内未能生成符合约束的表达式")
 
-        # 递归构建左右子树（确保子表达式已满足约束）
-        left_expr, left_val = self._build_expression(
-            operands[:split_point], operators[:split_point - 1]
-        )
-        right_expr, right_val = self._build_expression(
-            operands[split_point:], operators[split_point - 1:]
-        )
+    def _build_expression(self, operands: List[Fraction], operators: List[str]) -> Tuple[str, Fraction]:
+        """构建表达式树（检查所有子表达式约束）
 
-        op = operators[split_point - 1]
+        用显式栈按后序构建（随机分割点的抽取顺序与递归构建相同），运算符再多也不会触及递归深度上限。
+        分割点均匀随机，树高期望为 O(log n)，逐层拼接文本的总开销约为 O(L log n)。
+        """
+        backend = self.backend
+        priority = self.priority
+        randint = self.rng.randint
+        # 已构建的子树：(文本, 值, 主运算符)
+        built: List[Tuple[str, Fraction, Optional[str]]] = []
+        # 待处理的子问题：(操作数起点, 终点, 运算符起点, 分割点)，分割点为 None 表示尚未展开
+        stack: List[Tuple[int, int, int, Optional[int]]] = [(0, len(operands), 0, None)]
+        while stack:
+            lo, hi, ops_lo, split = stack.pop()
+            if split is None:
+                if hi - lo == 1:
+                    built.append((backend.to_string(operands[lo]), operands[lo], None))
+                    continue
+                # 随机选择分割点，先构建左子树再构建右子树
+                split = lo + randint(1, hi - lo - 1)
+                stack.append((lo, hi, ops_lo, split))
+                stack.append((split, hi, ops_lo + split - lo - 1, None))
+                stack.append((lo, split, ops_lo, None))
+                continue
 
-        # 计算结果并检查约束
-        if op == '+':
-            result = left_val + right_val
-        elif op == '-':
-            # 核心约束：减法必须满足 e1 ≥ e2（禁止中间结果为负数）
-            if left_val < right_val:
-                raise ValueError("减法子表达式结果为负数")
-            result = left_val - right_val
-        elif op == '×':
-            result = left_val * right_val
-        elif op == '÷':
-            # 核心约束：除法结果必须为真分数
-            if right_val.numerator == 0:
-                raise ZeroDivisionError("除数为0")
-            result = left_val / right_val
-            if not result.is_proper_fraction():
-                raise ValueError("除法子表达式结果非真分数")
+            right_text, right_val, right_op = built.pop()
+            left_text, left_val, left_op = built.pop()
+            op = operators[ops_lo + split - lo - 1]
 
-        # 添加括号
-        left_needs_paren = self._needs_parentheses(left_expr, op, is_left=True)
-        right_needs_paren = self._needs_parentheses(right_expr, op, is_left=False)
+            # 计算结果并检查约束
+            if op == '+':
+                result = backend.add(left_val, right_val)
+            elif op == '-':
+                # 核心约束：减法必须满足 e1 ≥ e2（禁止中间结果为负数）
+                if backend.lt(left_val, right_val):
+                    raise ConstraintError(GenerationStats.NEGATIVE_SUBTRACTION, "减法子表达式结果为负数")
+                result = backend.sub(left_val, right_val)
+            elif op == '×':
+                result = backend.mul(left_val, right_val)
+            else:
+                # 核心约束：除法结果必须为真分数
+                if backend.is_zero(right_val):
+                    raise ZeroDivisionError("除数为0")
+                result = backend.div(left_val, right_val)
+                if not backend.is_proper(result):
+                    raise ConstraintError(GenerationStats.IMPROPER_QUOTIENT, "除法子表达式结果非真分数")
 
-        left_str = f"({left_expr})" if left_needs_paren else left_expr
-        right_str = f"({right_expr})" if right_needs_paren else right_expr
+            # 添加括号（规则同 _operator_needs_parentheses，内联以减少调用开销）
+            if left_op is not None and priority[left_op] < priority[op]:
+                left_text = f"({left_text})"
+            if right_op is not None and priority[right_op] <= priority[op]:
+                right_text = f"({right_text})"
+            built.append((f"{left_text} {op} {right_text}", result, op))
 
-        expr_str = f"{left_str} {op} {right_str}"
-        return expr_str, result
+        text, result, _ = built[0]
+        return text, result
 
     def _needs_parentheses(self, expr: str, parent_op: str, is_left: bool) -> bool:
         """判断是否需要添加括号"""
-        # 如果表达式已经是单个数字，不需要括号
-        if not any(op in expr for op in self.operators):
-            return False
-
-        # 提取子表达式的主要运算符
-        sub_op = None
-        for op in self.operators:
-            if self._is_main_operator(expr, op):
-                sub_op = op
-                break
+        return self._operator_needs_parentheses(main_operator(tokenize(expr)), parent_op, is_left)
 
+    def _operator_needs_parentheses(self, sub_op: Optional[str], parent_op: str, is_left: bool) -> bool:
+        """根据子表达式主运算符判断是否需要添加括号"""
+        # 单个数字不需要括号
         if sub_op is None:
             return False
 
@@ -96,125 +173,121 @@ class Expression:
         if self.priority[sub_op] < self.priority[parent_op]:
             return True
 
-        # 相同优先级时的特殊情况
+        # 相同优先级时，左操作数不需要括号，右操作数需要括号
         if self.priority[sub_op] == self.priority[parent_op]:
-            # 对于 + 和 ×，左操作数不需要括号，右操作数需要括号
-            if parent_op in ['+', '×']:
-                return not is_left
-            # 对于 - 和 ÷，右操作数总是需要括号
-            elif parent_op in ['-', '÷']:
-                return not is_left
+            return not is_left
 
         # 如果子表达式优先级更高，不需要括号
         return False
 
-    def _is_main_operator(self, expr: str, op: str) -> bool:
-        """检查运算符是否是表达式的主要（最外层）运算符"""
-        # 移除最外层的括号（如果有）
-        stripped_expr = expr.strip()
-        if stripped_expr.startswith('(') and stripped_expr.endswith(')'):
-            # 检查括号是否匹配
-            bracket_count = 0
-            for i, char in enumerate(stripped_expr):
-                if char == '(':
-                    bracket_count += 1
-                elif char == ')':
-                    bracket_count -= 1
-                    if bracket_count == 0 and i < len(stripped_expr) - 1:
-                        # 括号没有包围整个表达式
-                        break
-            if bracket_count == 0:
-                stripped_expr = stripped_expr[1:-1].strip()
-
-        # 查找不在括号内的运算符
-        bracket_count = 0
-        for i, char in enumerate(stripped_expr):
-            if char == '(':
-                bracket_count += 1
-            elif char == ')':
-                bracket_count -= 1
-            elif bracket_count == 0 and char == op:
-                # 检查这个运算符是否真的是主要运算符
-                # 确保它不在其他运算符的范围内
-                return True
-        return False
-
     def _is_valid_expression(self, expr: str, result: Fraction) -> bool:
         """最终验证（确保无遗漏约束）"""
         # 确保最终结果非负（因中间步骤已约束，此处为双重保障）
-        if result.numerator < 0:
+        if self.backend.is_negative(result):
             return False
         # 确保除法结果为真分数（子步骤已约束，此处为双重保障）
-        if '÷' in expr and not result.is_proper_fraction():
+        if '÷' in expr and not self.backend.is_proper(result):
             return False
         return True
 
-    # 以下方法（evaluate_expression、_tokenize、_apply_operator）保持不变
     def evaluate_expression(self, expr: str) -> Fraction:
-        expr = expr.replace(' ', '')
-
-        def parse_expression(tokens):
-            values = []
-            ops = []
-            i = 0
-            while i < len(tokens):
-                token = tokens[i]
-                if token == '(':
-                    j = i + 1
-                    paren_count = 1
-                    while j < len(tokens) and paren_count > 0:
-                        if tokens[j] == '(':
-                            paren_count += 1
-                        elif tokens[j] == ')':
-                            paren_count -= 1
-                        j += 1
-                    sub_expr = tokens[i + 1:j - 1]
-                    values.append(parse_expression(sub_expr))
-                    i = j
-                elif token in self.operators:
-                    while (ops and ops[-1] != '(' and
-                           self.priority[ops[-1]] >= self.priority[token]):
-                        self._apply_operator(values, ops)
-                    ops.append(token)
-                    i += 1
-                else:
-                    values.append(Fraction.from_string(token))
-                    i += 1
-            while ops:
-                self._apply_operator(values, ops)
-            return values[0] if values else Fraction(0)
-
+        """求值；整个表达式与每个不超过 MEMO_MAX_TOKENS 个记号的括号子表达式按去空格后的记号序列在 memo 中缓存"""
         tokens = self._tokenize(expr)
-        return parse_expression(tokens)
+        memo = self.memo
+        if memo is None:
+            return self._evaluate_tokens(tokens)
+        value = memo.get(tokens)
+        if value is None:
+            value = self._evaluate_tokens(tokens)
+            memo.put(tokens, value)
+        return value
 
-    def _tokenize(self, expr: str) -> List[str]:
-        tokens = []
+    def _evaluate_tokens(self, tokens: Tuple[str, ...]) -> Fraction:
+        """单次扫描的运算符优先级求值，括号用显式栈处理，嵌套深度不受递归限制"""
+        from_string = self.backend.from_string
+        priority = self.priority
+        memo = self.memo
+        # 开启 memo 时需预先配对括号，以便在进入括号前按子表达式查询缓存
+        closing = _match_parentheses(tokens) if memo is not None and '(' in tokens else None
+        values: List[Fraction] = []
+        ops: List[str] = []
+        # 尚未闭合的括号：(子表达式记号序列, 进入括号时 values 的长度)
+        groups: List[Tuple[Optional[Tuple[str, ...]], int]] = []
         i = 0
-        while i < len(expr):
-            if expr[i] in '()+-×÷':
-                tokens.append(expr[i])
-                i += 1
+        while i < len(tokens):
+            token = tokens[i]
+            if token == '(':
+                sub_expr = None
+                if closing is not None and closing[i] - i - 1 <= MEMO_MAX_TOKENS:
+                    sub_expr = tokens[i + 1:closing[i]]
+                    value = memo.get(sub_expr)
+                    if value is not None:
+                        values.append(value)
+                        i = closing[i] + 1
+                        continue
+                groups.append((sub_expr, len(values)))
+                ops.append('(')
+            elif token == ')':
+                if not groups:
+                    raise ValueError("括号不匹配")
+                sub_expr, depth = groups[-1]
+                while ops[-1] != '(':
+                    # 括号内的运算符只能使用括号内的操作数
+                    if len(values) - depth < 2:
+                        raise ValueError("表达式格式错误: 括号内运算符缺少操作数")
+                    self._apply_operator(values, ops)
+                ops.pop()
+                groups.pop()
+                if len(values) == depth:
+                    # 空括号按 0 处理，不写入缓存
+                    values.append(self.backend.make(0))
+                elif len(values) - depth > 1:
+                    raise ValueError("表达式格式错误: 括号内有多余的操作数")
+                elif sub_expr is not None:
+                    memo.put(sub_expr, values[-1])
+            elif token in priority:
+                while ops and ops[-1] != '(' and priority[ops[-1]] >= priority[token]:
+                    self._apply_operator(values, ops)
+                ops.append(token)
             else:
-                j = i
-                while j < len(expr) and expr[j] not in '()+-×÷':
-                    j += 1
-                token = expr[i:j]
-                if token:
-                    tokens.append(token)
-                i = j
-        return tokens
+                values.append(from_string(token))
+            i += 1
+        if groups:
+            raise ValueError("括号不匹配")
+        while ops:
+            self._apply_operator(values, ops)
+        return values[0] if values else self.backend.make(0)
+
+    def _tokenize(self, expr: str) -> Tuple[str, ...]:
+        return tokenize(expr)
 
     def _apply_operator(self, values: List[Fraction], ops: List[str]):
-        if len(values) < 2 or not ops:
-            return
+        if len(values) < 2:
+            raise ValueError("表达式格式错误: 运算符缺少操作数")
         op = ops.pop()
         right = values.pop()
         left = values.pop()
+        backend = self.backend
         if op == '+':
-            values.append(left + right)
+            values.append(backend.add(left, right))
         elif op == '-':
-            values.append(left - right)
+            values.append(backend.sub(left, right))
         elif op == '×':
-            values.append(left * right)
+            values.append(backend.mul(left, right))
         elif op == '÷':
-            values.append(left / right)
\ No newline at end of file
+            values.append(backend.div(left, right))
+
+def _match_parentheses(tokens: Sequence[str]) -> Dict[int, int]:
+    """左括号位置到对应右括号位置的映射，括号不匹配时抛出 ValueError"""
+    closing = {}
+    opened = []
+    for i, token in enumerate(tokens):
+        if token == '(':
+            opened.append(i)
+        elif token == ')':
+            if not opened:
+                raise ValueError("括号不匹配")
+            closing[opened.pop()] = i
+    if opened:
+        raise ValueError("括号不匹配")
+    return closing
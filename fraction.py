@@ -17,33 +17,10 @@ class Fraction:
 
     @classmethod
     def from_string(cls, frac_str: str) -> 'Fraction':
-        frac_str = frac_str.strip()
-        if "'" in frac_str:
-            whole_part, frac_part = frac_str.split("'", 1)
-            whole = int(whole_part)
-            num, denom = map(int, frac_part.split('/'))
-            # 支持负数带分数解析
-            if whole < 0:
-                return cls(whole * denom - num, denom)
-            return cls(whole * denom + num, denom)
-        elif '/' in frac_str:
-            num, denom = map(int, frac_str.split('/'))
-            return cls(num, denom)
-        else:
-            return cls(int(frac_str))
+        return cls(*parse_fraction(frac_str))
 
     def to_string(self) -> str:
-        if self.denominator == 1:
-            return str(self.numerator)
-        if abs(self.numerator) < self.denominator:
-            return f"{self.numerator}/{self.denominator}"
-        else:
-            whole = self.numerator // self.denominator
-            remainder = abs(self.numerator) % self.denominator
-            if remainder == 0:
-                return str(whole)
-            else:
-                return f"{whole}'{remainder}/{self.denominator}"
+        return format_fraction(self.numerator, self.denominator)
 
     # 运算符重载方法保持不变
     def __add__(self, other: 'Fraction') -> 'Fraction':
@@ -86,15 +63,58 @@ class Fraction:
 
 
     @classmethod
-    def random_fraction(cls, max_range: int) -> 'Fraction':
-        """生成随机分数（确保分子在[0, max_range-1]范围内）"""
-        if random.random() < 0.5:
-            # 生成整数（0到max_range-1，符合0 <= numerator < max_range）
-            return cls(random.randint(0, max_range - 1))
+    def random_fraction(cls, max_range: int, rng=None) -> 'Fraction':
+        """生成随机分数（确保分子在[0, max_range-1]范围内）
+
+        rng 为 random.Random 实例，缺省时使用全局 random 模块。
+        """
+        return cls(*random_parts(max_range, rng))
+
+
+def parse_fraction(frac_str: str) -> Tuple[int, int]:
+    """解析 "3"、"3/5"、"2'3/8" 形式的分数，返回（分子, 分母）"""
+    frac_str = frac_str.strip()
+    if "'" in frac_str:
+        whole_part, frac_part = frac_str.split("'", 1)
+        whole = int(whole_part)
+        num, denom = map(int, frac_part.split('/'))
+        # 支持负数带分数解析
+        if whole < 0:
+            return whole * denom - num, denom
+        return whole * denom + num, denom
+    elif '/' in frac_str:
+        num, denom = map(int, frac_str.split('/'))
+        return num, denom
+    else:
+        return int(frac_str), 1
+
+
+def format_fraction(numerator: int, denominator: int) -> str:
+    """按 整数 / 真分数 / 带分数（whole'num/den）格式输出最简分数"""
+    if denominator == 1:
+        return str(numerator)
+    if abs(numerator) < denominator:
+        return f"{numerator}/{denominator}"
+    else:
+        whole = numerator // denominator
+        remainder = abs(numerator) % denominator
+        if remainder == 0:
+            return str(whole)
         else:
-            # 生成真分数：分子 <= 分母-1 且 分子 <= max_range-1
-            denominator = random.randint(2, max_range)
-            # 限制分子最大值为 max_range-1（同时不超过分母-1）
-            max_numerator = min(denominator - 1, max_range - 1)
-            numerator = random.randint(1, max_numerator)  # 分子范围：[1, max_numerator]
-            return cls(numerator, denominator)
\ No newline at end of file
+            return f"{whole}'{remainder}/{denominator}"
+
+
+def random_parts(max_range: int, rng=None) -> Tuple[int, int]:
+    """随机生成（分子, 分母），规则见 Fraction.random_fraction"""
+    if rng is None:
+        rng = random
+    if rng.random() < 0.5:
+        # 生成整数（0到max_range-1，符合0 <= numerator < max_range）
+        return rng.randint(0, max_range - 1), 1
+    else:
+        # 生成真分数：分子 <= 分母-1 且 分子 <= max_range-1
+        denominator = rng.randint(2, max_range)
+        # 限制分子最大值为 max_range-1（同时不超过分母-1）
+        max_numerator = min(denominator - 1, max_range - 1)
+        numerator = rng.randint(1, max_numerator)  # 分子范围：[1, max_numerator]
+        return numerator, denominator
\ No newline at end of file
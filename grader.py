@@ -1,11 +1,30 @@
-from typing import List, Tuple
-from fraction import Fraction
+from typing import List, Optional, Sequence, Tuple
 from expression import Expression
+from numeric import get_backend
+from vectorized import HAS_NUMPY, fractions_equal, split_indices
+from pipeline import DEFAULT_CHUNK_SIZE, GradingPipeline
+
+GRADING_BACKENDS = ('scalar', 'numpy', 'auto')
+
+# auto 后端只在一批至少有这么多行时才用 numpy：批量比较省下的时间很少，小批量抵不上导入 numpy 的开销
+NUMPY_MIN_ROWS = 50000
 
 
 class ExerciseGrader:
-    def __init__(self):
-        self.expression_parser = Expression()
+    def __init__(self, backend: str = 'scalar', numeric_backend: Optional[str] = None,
+                 memo_size: int = 0):
+        """backend: scalar 逐题比较（默认）；numpy 先求值再批量比较；
+        auto 在安装了 numpy 且一批不少于 NUMPY_MIN_ROWS 行时使用 numpy，否则逐题比较
+
+        numeric_backend 为求值使用的数值后端名称（见 numeric 模块），缺省使用默认后端。
+        memo_size 为子表达式缓存容量，同一实例批改的多个文件共享缓存，默认 0 即关闭。
+        """
+        self.expression_parser = Expression(backend=get_backend(numeric_backend), memo_size=memo_size)
+        if backend not in GRADING_BACKENDS:
+            raise ValueError(f"未知的批改后端: {backend}")
+        if backend == 'numpy' and not HAS_NUMPY:
+            raise ImportError("numpy 批改后端需要安装 numpy")
+        self.backend = backend
 
     def grade_exercises(self, exercise_file: str, answer_file: str) -> Tuple[List[int], List[int]]:
         """批改练习题"""
@@ -29,37 +48,108 @@ class ExerciseGrader:
             exercises = read_file_with_encoding(exercise_file)
             answers = read_file_with_encoding(answer_file)
 
-            for i, (exercise, answer) in enumerate(zip(exercises, answers), 1):
-                # 后续逻辑保持不变...
-                exercise = exercise.strip()
-                answer = answer.strip()
+            correct_indices, wrong_indices = self._grade_chunk(exercises, answers)
 
-                if not exercise or not answer:
-                    continue
+        except FileNotFoundError as e:
+            raise FileNotFoundError(f"文件未找到: {e}")
+        except Exception as e:
+            raise Exception(f"批改过程中发生错误: {e}")
 
-                if '=' in exercise:
-                    expr = exercise.split('=')[0].strip()
-                else:
-                    expr = exercise.strip()
+        return correct_indices, wrong_indices
 
-                try:
-                    computed_result = self.expression_parser.evaluate_expression(expr)
-                    expected_result = Fraction.from_string(answer)
-
-                    if computed_result == expected_result:
-                        correct_indices.append(i)
-                    else:
-                        wrong_indices.append(i)
-                except Exception:
-                    wrong_indices.append(i)
+    def grade_exercises_pipelined(self, exercise_file: str, answer_file: str, workers: int = 1,
+                                  chunk_size: int = DEFAULT_CHUNK_SIZE) -> Tuple[List[int], List[int]]:
+        """以流水线方式批改（读取与求值重叠，内存占用有界），结果与 grade_exercises 相同"""
+        return self.grade_files_pipelined([(exercise_file, answer_file)], workers, chunk_size)[0]
 
+    def grade_files_pipelined(self, files: Sequence[Tuple[str, str]], workers: int = 1,
+                              chunk_size: int = DEFAULT_CHUNK_SIZE) -> List[Tuple[List[int], List[int]]]:
+        """用同一条流水线批改多组 (题目文件, 答案文件)，按输入顺序返回各组结果"""
+        try:
+            return GradingPipeline(self._grade_chunk, workers, chunk_size).run(files)
         except FileNotFoundError as e:
             raise FileNotFoundError(f"文件未找到: {e}")
         except Exception as e:
             raise Exception(f"批改过程中发生错误: {e}")
 
+    @staticmethod
+    def _split_line(exercise: str, answer: str) -> Optional[Tuple[str, str]]:
+        """提取题目表达式与答案文本，空行返回 None"""
+        exercise = exercise.strip()
+        answer = answer.strip()
+
+        if not exercise or not answer:
+            return None
+
+        if '=' in exercise:
+            expr = exercise.split('=')[0].strip()
+        else:
+            expr = exercise.strip()
+        return expr, answer
+
+    def _grade_chunk(self, exercises: List[str], answers: List[str],
+                     start: int = 1) -> Tuple[List[int], List[int]]:
+        """按批改后端选择逐题比较或批量比较"""
+        if self.backend == 'numpy' or (self.backend == 'auto' and HAS_NUMPY and len(exercises) >= NUMPY_MIN_ROWS):
+            return self._grade_batched(exercises, answers, start)
+        return self._grade_scalar(exercises, answers, start)
+
+    def _grade_scalar(self, exercises: List[str], answers: List[str],
+                      start: int = 1) -> Tuple[List[int], List[int]]:
+        """逐题求值并比较（start 为第一行的题号）"""
+        correct_indices = []
+        wrong_indices = []
+        numeric = self.expression_parser.backend
+
+        for i, (exercise, answer) in enumerate(zip(exercises, answers), start):
+            line = self._split_line(exercise, answer)
+            if line is None:
+                continue
+            expr, answer = line
+
+            try:
+                computed_result = self.expression_parser.evaluate_expression(expr)
+                expected_result = numeric.from_string(answer)
+
+                if numeric.eq(computed_result, expected_result):
+                    correct_indices.append(i)
+                else:
+                    wrong_indices.append(i)
+            except Exception:
+                wrong_indices.append(i)
+
         return correct_indices, wrong_indices
 
+    def _grade_batched(self, exercises: List[str], answers: List[str],
+                       start: int = 1) -> Tuple[List[int], List[int]]:
+        """先求值并收集分子/分母列，再用 numpy 批量交叉相乘比较（start 为第一行的题号）"""
+        indices = []
+        error_indices = []
+        computed_num, computed_den, expected_num, expected_den = [], [], [], []
+        numeric = self.expression_parser.backend
+
+        for i, (exercise, answer) in enumerate(zip(exercises, answers), start):
+            line = self._split_line(exercise, answer)
+            if line is None:
+                continue
+            expr, answer = line
+
+            try:
+                computed_result = self.expression_parser.evaluate_expression(expr)
+                expected_result = numeric.from_string(answer)
+            except Exception:
+                error_indices.append(i)
+                continue
+
+            indices.append(i)
+            computed_num.append(numeric.numerator(computed_result))
+            computed_den.append(numeric.denominator(computed_result))
+            expected_num.append(numeric.numerator(expected_result))
+            expected_den.append(numeric.denominator(expected_result))
+
+        equal = fractions_equal(computed_num, computed_den, expected_num, expected_den)
+        return split_indices(indices, equal, error_indices)
+
     def generate_grade_report(self, correct_indices: List[int], wrong_indices: List[int]) -> str:
         """生成批改报告"""
         correct_str = ", ".join(map(str, correct_indices))
@@ -0,0 +1,56 @@
+import re
+from functools import lru_cache
+from typing import Optional, Sequence, Tuple
+
+OPERATORS = ('+', '-', '×', '÷')
+PRIORITY = {'+': 1, '-': 1, '×': 2, '÷': 2}
+
+# 每道题运算符个数的默认上限与命令行允许的最大值
+DEFAULT_MAX_OPERATORS = 3
+MAX_OPERATORS = 10
+
+# 按运算符和括号切分，两者之间的连续字符即为一个操作数
+_SPLIT_RE = re.compile(r"([()+\-×÷])")
+
+
+@lru_cache(maxsize=1024)
+def tokenize(expr: str) -> Tuple[str, ...]:
+    """单次扫描得到表达式的记号序列（忽略空格）
+
+    结果按表达式文本缓存，生成、查重与批改对同一表达式的多次调用只会扫描一次。
+    """
+    return tuple(filter(None, _SPLIT_RE.split(expr.replace(' ', ''))))
+
+
+def count_operators(tokens: Sequence[str]) -> int:
+    return sum(1 for token in tokens if token in PRIORITY)
+
+
+def main_operator(tokens: Sequence[str]) -> Optional[str]:
+    """返回最外层（括号外）优先级最低的运算符，单个操作数返回 None"""
+    # 整体被一对括号包围时去掉外层括号
+    while len(tokens) >= 2 and tokens[0] == '(' and tokens[-1] == ')':
+        depth = 0
+        for i, token in enumerate(tokens):
+            if token == '(':
+                depth += 1
+            elif token == ')':
+                depth -= 1
+                if depth == 0 and i < len(tokens) - 1:
+                    break
+        else:
+            tokens = tokens[1:-1]
+            continue
+        break
+
+    main_op = None
+    depth = 0
+    for token in tokens:
+        if token == '(':
+            depth += 1
+        elif token == ')':
+            depth -= 1
+        elif depth == 0 and token in PRIORITY:
+            if main_op is None or PRIORITY[token] <= PRIORITY[main_op]:
+                main_op = token
+    return main_op
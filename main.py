@@ -1,51 +1,96 @@
 #!/usr/bin/env python3
 import sys
 import os
+import random
 from utils import parse_arguments, generate_exercises, save_to_file
 from grader import ExerciseGrader
+from stats import GenerationStats
+from profiler import profiler_from_argv
+from shard import shard_filenames
+from numeric import set_default_backend
+from bank import ExerciseBank
 
 
 def main():
     """主程序"""
-    args = parse_arguments()
+    profiler = profiler_from_argv(sys.argv[1:])
+    try:
+        run(profiler)
+    finally:
+        profiler.write_summary()
+
+
+def run(profiler):
+    with profiler.phase('parse'):
+        args = parse_arguments()
+        set_default_backend(args.backend)
 
     if args.n is not None:
         # 生成模式
         print(f"生成 {args.n} 个题目，数值范围: {args.r}")
 
-        exercises = generate_exercises(args.n, args.r)
+        stats = GenerationStats()
+        with profiler.phase('generate'):
+            if args.bank is not None:
+                # 题库模式：按索引随机抽题，耗时与题库大小无关
+                with ExerciseBank(args.bank) as bank:
+                    rng = random.Random(args.seed) if args.seed is not None else None
+                    exercises = bank.sample(args.n, rng, max_range=args.r, max_operators=args.max_operators)
+                stats.accepted = len(exercises)
+                if len(exercises) < args.n:
+                    print(f"警告: 题库中符合条件的题目只有 {len(exercises)} 个")
+            else:
+                exercises = generate_exercises(args.n, args.r, stats, args.workers, args.seed, args.shard,
+                                               args.deadline, args.max_operators)
+
+        if args.stats:
+            print(stats.summary())
 
         if not exercises:
             print("无法生成有效的题目")
             sys.exit(1)
 
-        # 保存题目和答案
-        exercise_list = [ex[0] for ex in exercises]
-        answer_list = [ex[1] for ex in exercises]
+        # 保存题目和答案（分片模式下文件名带分片编号）
+        exercise_file, answer_file = "Exercises.txt", "Answers.txt"
+        if args.shard is not None:
+            exercise_file, answer_file = shard_filenames(args.shard)
 
-        save_to_file(exercise_list, "Exercises.txt")
-        save_to_file(answer_list, "Answers.txt")
+        with profiler.phase('write'):
+            exercise_list = [ex[0] for ex in exercises]
+            answer_list = [ex[1] for ex in exercises]
 
-        print(f"题目已保存到 Exercises.txt")
-        print(f"答案已保存到 Answers.txt")
+            save_to_file(exercise_list, exercise_file)
+            save_to_file(answer_list, answer_file)
+
+        print(f"题目已保存到 {exercise_file}")
+        print(f"答案已保存到 {answer_file}")
 
     else:
         # 批改模式
         print(f"批改练习题: {args.e}")
         print(f"答案文件: {args.a}")
 
-        grader = ExerciseGrader()
+        grader = ExerciseGrader(memo_size=args.memo_size)
 
         try:
-            correct_indices, wrong_indices = grader.grade_exercises(args.e, args.a)
-            report = grader.generate_grade_report(correct_indices, wrong_indices)
+            with profiler.phase('grade'):
+                if args.pipeline_workers > 0:
+                    correct_indices, wrong_indices = grader.grade_exercises_pipelined(
+                        args.e, args.a, args.pipeline_workers)
+                else:
+                    correct_indices, wrong_indices = grader.grade_exercises(args.e, args.a)
+
+            with profiler.phase('report'):
+                report = grader.generate_grade_report(correct_indices, wrong_indices)
 
-            # 保存批改结果
-            with open("Grade.txt", 'w', encoding='utf-8') as f:
-                f.write(report)
+                # 保存批改结果
+                with open("Grade.txt", 'w', encoding='utf-8') as f:
+                    f.write(report)
 
             print(report)
             print("批改结果已保存到 Grade.txt")
+            if args.stats and grader.expression_parser.memo is not None:
+                print(grader.expression_parser.memo.summary())
 
         except Exception as e:
             print(f"批改过程中发生错误: {e}")
@@ -53,4 +98,4 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,58 @@
+import threading
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+
+# 开启求值子表达式缓存时的建议容量（缓存默认关闭：生成的题目很少重复，逐次查询反而更慢）
+DEFAULT_MEMO_SIZE = 16384
+
+
+class MemoCache:
+    """有界 LRU 缓存，记录命中与未命中次数
+
+    加锁保护，可在多个求值线程之间共享。缓存的值不能为 None。
+    """
+
+    def __init__(self, maxsize: int = DEFAULT_MEMO_SIZE):
+        if maxsize < 1:
+            raise ValueError("缓存容量必须为正整数")
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data: 'OrderedDict[Hashable, Any]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """命中时返回缓存值并标记为最近使用，未命中返回 None"""
+        with self._lock:
+            value = self._data.get(key)
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self._data.move_to_end(key)
+            return value
+
+    def put(self, key: Hashable, value: Any):
+        with self._lock:
+            self._data[key] = value
+            if len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.hits = self.misses = 0
+
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def to_dict(self):
+        return {'hits': self.hits, 'misses': self.misses, 'size': len(self._data), 'maxsize': self.maxsize}
+
+    def summary(self) -> str:
+        return (f"子表达式缓存: 命中 {self.hits}，未命中 {self.misses}，"
+                f"命中率 {self.hit_rate():.1%}，条目 {len(self._data)}/{self.maxsize}")
@@ -0,0 +1,163 @@
+"""可插拔的数值后端
+
+生成、求值与批改通过 NumericBackend 完成分数的构造、运算、比较与格式化，
+可在启动时选择：
+    fraction  项目自带的 fraction.Fraction（默认）
+    stdlib    标准库 fractions.Fraction
+    tuple     最简 (分子, 分母) 整数元组，无对象开销
+所有后端共用 fraction 模块的解析与 whole'num/den 格式化规则。
+"""
+import fractions
+import math
+import operator
+from typing import Any, Dict, Optional, Tuple
+from fraction import Fraction, format_fraction, parse_fraction, random_parts
+
+
+class NumericBackend:
+    """数值后端接口，值的具体类型由后端决定"""
+
+    name = ''
+
+    def make(self, numerator: int, denominator: int = 1) -> Any:
+        raise NotImplementedError
+
+    def numerator(self, value) -> int:
+        raise NotImplementedError
+
+    def denominator(self, value) -> int:
+        raise NotImplementedError
+
+    def add(self, a, b):
+        raise NotImplementedError
+
+    def sub(self, a, b):
+        raise NotImplementedError
+
+    def mul(self, a, b):
+        raise NotImplementedError
+
+    def div(self, a, b):
+        raise NotImplementedError
+
+    def lt(self, a, b) -> bool:
+        raise NotImplementedError
+
+    def eq(self, a, b) -> bool:
+        raise NotImplementedError
+
+    def from_string(self, text: str):
+        return self.make(*parse_fraction(text))
+
+    def to_string(self, value) -> str:
+        return format_fraction(self.numerator(value), self.denominator(value))
+
+    def random(self, max_range: int, rng=None):
+        return self.make(*random_parts(max_range, rng))
+
+    def is_zero(self, value) -> bool:
+        return self.numerator(value) == 0
+
+    def is_negative(self, value) -> bool:
+        return self.numerator(value) < 0
+
+    def is_proper(self, value) -> bool:
+        """是否为真分数（绝对值小于1）"""
+        return abs(self.numerator(value)) < self.denominator(value)
+
+
+class ClassBackend(NumericBackend):
+    """基于支持运算符重载的分数类（fraction.Fraction 或 fractions.Fraction）"""
+
+    def __init__(self, name: str, cls):
+        self.name = name
+        self.make = cls
+        self.numerator = operator.attrgetter('numerator')
+        self.denominator = operator.attrgetter('denominator')
+        self.add = operator.add
+        self.sub = operator.sub
+        self.mul = operator.mul
+        self.div = operator.truediv
+        self.lt = operator.lt
+        self.eq = operator.eq
+
+
+class ProjectFractionBackend(ClassBackend):
+    def __init__(self):
+        super().__init__('fraction', Fraction)
+        self.from_string = Fraction.from_string
+        self.to_string = Fraction.to_string
+        self.random = Fraction.random_fraction
+        self.is_proper = Fraction.is_proper_fraction
+
+
+def _pair(numerator: int, denominator: int = 1) -> Tuple[int, int]:
+    if denominator == 0:
+        raise ZeroDivisionError("分母不能为0")
+    if denominator < 0:
+        numerator, denominator = -numerator, -denominator
+    g = math.gcd(numerator, denominator)
+    return numerator // g, denominator // g
+
+
+def _pair_add(a: Tuple[int, int], b: Tuple[int, int]) -> Tuple[int, int]:
+    return _pair(a[0] * b[1] + b[0] * a[1], a[1] * b[1])
+
+
+def _pair_sub(a: Tuple[int, int], b: Tuple[int, int]) -> Tuple[int, int]:
+    return _pair(a[0] * b[1] - b[0] * a[1], a[1] * b[1])
+
+
+def _pair_mul(a: Tuple[int, int], b: Tuple[int, int]) -> Tuple[int, int]:
+    return _pair(a[0] * b[0], a[1] * b[1])
+
+
+def _pair_div(a: Tuple[int, int], b: Tuple[int, int]) -> Tuple[int, int]:
+    if b[0] == 0:
+        raise ZeroDivisionError("除数不能为0")
+    return _pair(a[0] * b[1], a[1] * b[0])
+
+
+def _pair_lt(a: Tuple[int, int], b: Tuple[int, int]) -> bool:
+    return a[0] * b[1] < b[0] * a[1]
+
+
+class TupleBackend(NumericBackend):
+    """最简 (分子, 分母) 元组，分母恒为正，可直接用 == 比较"""
+
+    name = 'tuple'
+
+    def __init__(self):
+        self.make = _pair
+        self.numerator = operator.itemgetter(0)
+        self.denominator = operator.itemgetter(1)
+        self.add = _pair_add
+        self.sub = _pair_sub
+        self.mul = _pair_mul
+        self.div = _pair_div
+        self.lt = _pair_lt
+        self.eq = operator.eq
+
+
+BACKENDS: Dict[str, NumericBackend] = {
+    'fraction': ProjectFractionBackend(),
+    'stdlib': ClassBackend('stdlib', fractions.Fraction),
+    'tuple': TupleBackend(),
+}
+
+_default_backend = BACKENDS['fraction']
+
+
+def get_backend(name: Optional[str] = None) -> NumericBackend:
+    """按名称获取后端，缺省返回当前默认后端"""
+    if name is None:
+        return _default_backend
+    if name not in BACKENDS:
+        raise ValueError(f"未知的数值后端: {name}")
+    return BACKENDS[name]
+
+
+def set_default_backend(name: str):
+    """设置默认后端（应在启动时、创建 Expression 之前调用）"""
+    global _default_backend
+    _default_backend = get_backend(name)
@@ -0,0 +1,144 @@
+"""流水线批改：读取 → 求值 → 汇总三个阶段由有界队列连接，文件读取与求值互相重叠
+
+    读取线程  按块读取题目/答案文件（每个文件整体选定一种编码），放入任务队列
+    求值线程  从任务队列取块批改，结果放入结果队列
+    汇总阶段  （调用线程）按块序号重新排序并写入各文件的结果
+
+在途的块数（已读取但尚未汇总）不超过 max_in_flight，除结果题号列表外内存占用与文件大小无关。
+求值在 GIL 下不能并行，收益来自读取、解码与求值的重叠，总耗时取决于最慢的阶段；
+多个求值线程只在求值阶段能释放 GIL 时才有帮助，因此默认只用一个。
+"""
+import codecs
+import itertools
+import queue
+import threading
+from typing import Callable, Iterator, List, Optional, Sequence, Tuple
+
+ENCODINGS = ('utf-8', 'gbk', 'gb2312')
+DEFAULT_CHUNK_SIZE = 1000
+
+GradeResult = Tuple[List[int], List[int]]
+# (题目行, 答案行, 起始题号) -> (正确题号, 错误题号)
+ChunkGrader = Callable[[List[str], List[str], int], GradeResult]
+
+_DONE = object()
+
+
+def detect_encoding(path: str, block_size: int = 1 << 16) -> str:
+    """按 ENCODINGS 顺序返回第一个能解码整个文件的编码，与 grade_exercises 的回退规则相同
+
+    逐块增量解码检查，不把整个文件读入内存。
+    """
+    for encoding in ENCODINGS:
+        decoder = codecs.getincrementaldecoder(encoding)()
+        try:
+            with open(path, 'rb') as f:
+                for block in iter(lambda: f.read(block_size), b''):
+                    decoder.decode(block)
+            decoder.decode(b'', final=True)
+            return encoding
+        except UnicodeDecodeError:
+            continue
+    raise ValueError(f"文件 {path} 无法用以下编码解析: {list(ENCODINGS)}")
+
+
+def read_chunks(exercise_file: str, answer_file: str,
+                chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[Tuple[int, List[str], List[str]]]:
+    """同步读取两个文件，每次产出 (起始题号, 题目行, 答案行)，在较短的文件结束时停止
+
+    与 grade_exercises 一样按通用换行符（LF、CRLF 或单独的 CR）分行。
+    """
+    ex_encoding = detect_encoding(exercise_file)
+    ans_encoding = detect_encoding(answer_file)
+    with open(exercise_file, 'r', encoding=ex_encoding, newline=None) as ex_f, \
+            open(answer_file, 'r', encoding=ans_encoding, newline=None) as ans_f:
+        start = 1
+        while True:
+            exercises = list(itertools.islice(ex_f, chunk_size))
+            answers = list(itertools.islice(ans_f, chunk_size))
+            # 较短的文件决定题目数量
+            del exercises[len(answers):], answers[len(exercises):]
+            if exercises:
+                yield start, exercises, answers
+                start += len(exercises)
+            if len(exercises) < chunk_size:
+                return
+
+
+class GradingPipeline:
+    """读取线程 + 求值线程池 + 汇总阶段的批改流水线"""
+
+    def __init__(self, grade_chunk: ChunkGrader, workers: int = 1, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                 max_in_flight: Optional[int] = None):
+        if workers < 1:
+            raise ValueError("求值线程数必须为正整数")
+        self.grade_chunk = grade_chunk
+        self.workers = workers
+        self.chunk_size = chunk_size
+        self.max_in_flight = max_in_flight if max_in_flight is not None else 2 * workers + 2
+
+    def run(self, files: Sequence[Tuple[str, str]]) -> List[GradeResult]:
+        """批改多组 (题目文件, 答案文件)，按输入顺序返回每组的 (正确题号, 错误题号)"""
+        tasks: queue.Queue = queue.Queue(self.max_in_flight)
+        results: queue.Queue = queue.Queue(self.max_in_flight)
+        slots = threading.BoundedSemaphore(self.max_in_flight)
+        errors: List[BaseException] = []
+
+        def reader():
+            sequence = 0
+            try:
+                for file_index, (exercise_file, answer_file) in enumerate(files):
+                    for start, exercises, answers in read_chunks(exercise_file, answer_file, self.chunk_size):
+                        slots.acquire()
+                        tasks.put((sequence, file_index, start, exercises, answers))
+                        sequence += 1
+            except BaseException as e:
+                errors.append(e)
+            finally:
+                for _ in range(self.workers):
+                    tasks.put(_DONE)
+
+        def evaluator():
+            while True:
+                task = tasks.get()
+                if task is _DONE:
+                    results.put(_DONE)
+                    return
+                sequence, file_index, start, exercises, answers = task
+                try:
+                    outcome = self.grade_chunk(exercises, answers, start)
+                except BaseException as e:
+                    outcome = e
+                results.put((sequence, file_index, outcome))
+
+        threads = [threading.Thread(target=reader, daemon=True)]
+        threads += [threading.Thread(target=evaluator, daemon=True) for _ in range(self.workers)]
+        for thread in threads:
+            thread.start()
+
+        # 汇总阶段：按块序号顺序写入结果，写入后才释放在途名额
+        graded: List[GradeResult] = [([], []) for _ in files]
+        pending = {}
+        next_sequence = 0
+        finished = 0
+        while finished < self.workers:
+            item = results.get()
+            if item is _DONE:
+                finished += 1
+                continue
+            pending[item[0]] = item
+            while next_sequence in pending:
+                _, file_index, outcome = pending.pop(next_sequence)
+                if isinstance(outcome, BaseException):
+                    errors.append(outcome)
+                else:
+                    graded[file_index][0].extend(outcome[0])
+                    graded[file_index][1].extend(outcome[1])
+                slots.release()
+                next_sequence += 1
+
+        for thread in threads:
+            thread.join()
+        if errors:
+            raise errors[0]
+        return graded
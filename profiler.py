@@ -0,0 +1,166 @@
+import argparse
+import cProfile
+import io
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+PROFILE_MODES = ('cprofile', 'sample')
+
+
+def add_profile_arguments(parser: argparse.ArgumentParser):
+    """注册性能分析相关的命令行参数"""
+    parser.add_argument('--profile', choices=PROFILE_MODES,
+                        help='按阶段进行性能分析：cprofile 为确定性分析，sample 为轻量采样')
+    parser.add_argument('--profile-dir', type=str, default='profile', help='性能分析结果输出目录')
+    parser.add_argument('--profile-memory', action='store_true', help='记录各阶段的 tracemalloc 峰值内存')
+
+
+def profiler_from_argv(argv: List[str]) -> 'PhaseProfiler':
+    """在正式解析参数前预读性能分析参数，使参数解析阶段本身也能被分析"""
+    parser = argparse.ArgumentParser(add_help=False)
+    add_profile_arguments(parser)
+    args, _ = parser.parse_known_args(argv)
+    return PhaseProfiler(args.profile, args.profile_dir, args.profile_memory)
+
+
+class _Sampler:
+    """采样分析器：后台线程定期抓取目标线程的调用栈"""
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.self_counts: Counter = Counter()
+        self.total_counts: Counter = Counter()
+        self.samples = 0
+        self._target = threading.get_ident()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self._target)
+            if frame is None:
+                continue
+            self.samples += 1
+            seen = set()
+            top = True
+            while frame is not None:
+                code = frame.f_code
+                key = f"{os.path.basename(code.co_filename)}:{code.co_firstlineno}({code.co_name})"
+                if top:
+                    self.self_counts[key] += 1
+                    top = False
+                if key not in seen:
+                    self.total_counts[key] += 1
+                    seen.add(key)
+                frame = frame.f_back
+
+    def report(self, limit: int = 30) -> str:
+        lines = [f"samples: {self.samples}, interval: {self.interval * 1000:.1f}ms", "",
+                 f"{'self':>8} {'self%':>7} {'total':>8} {'total%':>7}  function"]
+        total = self.samples or 1
+        for key, count in self.total_counts.most_common(limit):
+            own = self.self_counts.get(key, 0)
+            lines.append(f"{own:>8} {own / total:>7.1%} {count:>8} {count / total:>7.1%}  {key}")
+        return "\n".join(lines) + "\n"
+
+
+class PhaseProfiler:
+    """按流水线阶段进行性能分析，未启用时 phase() 不做任何事"""
+
+    def __init__(self, mode: Optional[str] = None, output_dir: str = 'profile', memory: bool = False):
+        if mode is not None and mode not in PROFILE_MODES:
+            raise ValueError(f"未知的分析模式: {mode}")
+        self.mode = mode
+        self.output_dir = output_dir
+        self.memory = memory
+        self.phases: Dict[str, Dict] = {}
+
+    @property
+    def enabled(self) -> bool:
+        return self.mode is not None or self.memory
+
+    @contextmanager
+    def phase(self, name: str):
+        if not self.enabled:
+            yield
+            return
+
+        os.makedirs(self.output_dir, exist_ok=True)
+        profile = cProfile.Profile() if self.mode == 'cprofile' else None
+        sampler = _Sampler() if self.mode == 'sample' else None
+        started_tracing = False
+        if self.memory:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                started_tracing = True
+            tracemalloc.reset_peak()
+
+        start = time.perf_counter()
+        if profile is not None:
+            profile.enable()
+        if sampler is not None:
+            sampler.start()
+        try:
+            yield
+        finally:
+            if profile is not None:
+                profile.disable()
+            if sampler is not None:
+                sampler.stop()
+            elapsed = time.perf_counter() - start
+
+            record = {'elapsed': elapsed}
+            if profile is not None:
+                self._write_cprofile(name, profile)
+            if sampler is not None:
+                self._write_text(f"{name}.sample.txt", sampler.report())
+            if self.memory:
+                _, peak = tracemalloc.get_traced_memory()
+                record['peak_memory'] = peak
+                self._write_memory(name, tracemalloc.take_snapshot(), peak)
+                if started_tracing:
+                    tracemalloc.stop()
+            self.phases[name] = record
+
+    def _write_text(self, filename: str, content: str):
+        with open(os.path.join(self.output_dir, filename), 'w', encoding='utf-8') as f:
+            f.write(content)
+
+    def _write_cprofile(self, name: str, profile: cProfile.Profile):
+        profile.dump_stats(os.path.join(self.output_dir, f"{name}.pstats"))
+        buffer = io.StringIO()
+        pstats.Stats(profile, stream=buffer).sort_stats('cumulative').print_stats(30)
+        self._write_text(f"{name}.txt", buffer.getvalue())
+
+    def _write_memory(self, name: str, snapshot: tracemalloc.Snapshot, peak: int):
+        lines = [f"peak: {peak} bytes", ""]
+        for stat in snapshot.statistics('lineno')[:20]:
+            lines.append(str(stat))
+        self._write_text(f"{name}.memory.txt", "\n".join(lines) + "\n")
+
+    def write_summary(self):
+        """写出各阶段耗时（及峰值内存）汇总"""
+        if not self.enabled or not self.phases:
+            return
+        lines = []
+        for name, record in self.phases.items():
+            line = f"{name}: {record['elapsed']:.4f}s"
+            if 'peak_memory' in record:
+                line += f", peak {record['peak_memory']} bytes"
+            lines.append(line)
+        self._write_text("summary.txt", "\n".join(lines) + "\n")
+        print(f"性能分析结果已保存到 {self.output_dir}")
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""分片生成的哈希划分与合并工具
+
+各节点以 --shard i/N 生成题目时，只接受查重键哈希落在第 i 个分区的题目，
+因此不同分片之间天然不会重复。合并时只需逐行检查所属分区与分片内不重复。
+"""
+import argparse
+import hashlib
+import re
+import sys
+from typing import List, Tuple
+from validator import ExpressionValidator
+
+Shard = Tuple[int, int]
+
+_SHARD_FILE_RE = re.compile(r"^(?P<prefix>.*)Exercises-(?P<index>\d+)-of-(?P<count>\d+)\.txt$")
+
+
+def parse_shard(text: str) -> Shard:
+    """解析 "i/N"（i 从 0 开始）"""
+    try:
+        index, count = map(int, text.split('/'))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"分片格式应为 i/N: {text}")
+    if count < 1 or not 0 <= index < count:
+        raise argparse.ArgumentTypeError(f"分片编号应满足 0 <= i < N: {text}")
+    return index, count
+
+
+def shard_of(key: str, count: int) -> int:
+    """查重键所属的分区（与进程、机器无关的稳定哈希）"""
+    digest = hashlib.blake2b(key.encode('utf-8'), digest_size=8).digest()
+    return int.from_bytes(digest, 'big') % count
+
+
+def shard_filenames(shard: Shard) -> Tuple[str, str]:
+    index, count = shard
+    return f"Exercises-{index}-of-{count}.txt", f"Answers-{index}-of-{count}.txt"
+
+
+def _read_lines(path: str) -> List[str]:
+    with open(path, 'r', encoding='utf-8') as f:
+        return f.read().splitlines()
+
+
+def merge_shards(exercise_files: List[str], exercise_output: str, answer_output: str) -> int:
+    """按分片编号顺序合并各分片输出并校验划分不变式，返回题目总数
+
+    校验内容：每道题的查重键都落在其所在分片的分区内，且分片内不重复。
+    两者成立即可保证合并结果无重复，无需在全部题目上构建查重集合。
+    """
+    shards = []
+    for path in exercise_files:
+        match = _SHARD_FILE_RE.match(path)
+        if match is None:
+            raise ValueError(f"无法从文件名识别分片: {path}")
+        index, count = int(match.group('index')), int(match.group('count'))
+        answer_path = f"{match.group('prefix')}Answers-{index}-of-{count}.txt"
+        shards.append((index, count, path, answer_path))
+
+    counts = {count for _, count, _, _ in shards}
+    if len(counts) != 1:
+        raise ValueError(f"分片总数不一致: {sorted(counts)}")
+    indices = [index for index, _, _, _ in shards]
+    if len(set(indices)) != len(indices):
+        raise ValueError("存在重复的分片编号")
+
+    validator = ExpressionValidator()
+    total = 0
+    with open(exercise_output, 'w', encoding='utf-8') as ex_out, \
+            open(answer_output, 'w', encoding='utf-8') as ans_out:
+        for index, count, ex_path, ans_path in sorted(shards):
+            exercises = _read_lines(ex_path)
+            answers = _read_lines(ans_path)
+            if len(exercises) != len(answers):
+                raise ValueError(f"分片 {index} 的题目与答案行数不一致")
+
+            seen = set()
+            for line, (exercise, answer) in enumerate(zip(exercises, answers), 1):
+                key = validator.fingerprint(exercise.split('=')[0])
+                if shard_of(key, count) != index:
+                    raise ValueError(f"分片 {index} 第 {line} 行不属于该分片: {exercise}")
+                if key in seen:
+                    raise ValueError(f"分片 {index} 第 {line} 行重复: {exercise}")
+                seen.add(key)
+                ex_out.write(exercise + '\n')
+                ans_out.write(answer + '\n')
+            total += len(exercises)
+
+    missing = sorted(set(range(counts.pop())) - set(indices))
+    if missing:
+        print(f"警告: 缺少分片 {missing}")
+    return total
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description='合并分片生成的题目并校验无重复')
+    parser.add_argument('files', nargs='+', help='各分片的题目文件（Exercises-i-of-N.txt）')
+    parser.add_argument('-o', type=str, default='Exercises.txt', help='合并后的题目文件')
+    parser.add_argument('-a', type=str, default='Answers.txt', help='合并后的答案文件')
+    args = parser.parse_args(argv)
+
+    try:
+        total = merge_shards(args.files, args.o, args.a)
+    except (OSError, ValueError) as e:
+        print(f"合并失败: {e}")
+        return 1
+
+    print(f"已合并 {len(args.files)} 个分片，共 {total} 个题目")
+    print(f"题目已保存到 {args.o}")
+    print(f"答案已保存到 {args.a}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
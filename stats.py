@@ -0,0 +1,84 @@
+import time
+from typing import Dict, Optional
+
+
+class GenerationStats:
+    """题目生成遥测：尝试次数、按原因统计的拒绝次数与各阶段耗时"""
+
+    NEGATIVE_SUBTRACTION = 'negative_subtraction'
+    IMPROPER_QUOTIENT = 'improper_quotient'
+    ZERO_DIVISOR = 'zero_divisor'
+    DUPLICATE = 'duplicate'
+    OPERATOR_LIMIT = 'operator_limit'
+    OTHER_SHARD = 'other_shard'
+    INVALID_OPERAND = 'invalid_operand'
+    REASONS = (NEGATIVE_SUBTRACTION, IMPROPER_QUOTIENT, ZERO_DIVISOR, DUPLICATE, OPERATOR_LIMIT, OTHER_SHARD,
+               INVALID_OPERAND)
+
+    STAGES = ('build', 'validate', 'dedup')
+
+    def __init__(self):
+        self.attempts = 0
+        self.accepted = 0
+        self.rejections: Dict[str, int] = {reason: 0 for reason in self.REASONS}
+        self.timings: Dict[str, float] = {stage: 0.0 for stage in self.STAGES}
+        self.start_time = time.perf_counter()
+        # 未完成全部题目时的停止原因（见 GenerationBudget）
+        self.stop_reason: Optional[str] = None
+
+    def reject(self, reason: str):
+        self.rejections[reason] = self.rejections.get(reason, 0) + 1
+
+    def add_time(self, stage: str, seconds: float):
+        self.timings[stage] += seconds
+
+    def merge(self, other: 'GenerationStats'):
+        """合并其他实例（如各工作线程）的计数与耗时"""
+        self.attempts += other.attempts
+        self.accepted += other.accepted
+        for reason, count in other.rejections.items():
+            self.rejections[reason] = self.rejections.get(reason, 0) + count
+        for stage, seconds in other.timings.items():
+            self.timings[stage] = self.timings.get(stage, 0.0) + seconds
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.start_time
+
+    def rate(self) -> float:
+        """每秒接受的题目数"""
+        elapsed = self.elapsed()
+        return self.accepted / elapsed if elapsed > 0 else 0.0
+
+    def eta(self, total: int) -> Optional[float]:
+        """按当前速率估算剩余秒数"""
+        rate = self.rate()
+        if rate <= 0:
+            return None
+        return max(0, total - self.accepted) / rate
+
+    def progress_line(self, total: int) -> str:
+        eta = self.eta(total)
+        eta_str = f"{eta:.1f}s" if eta is not None else "未知"
+        return (f"已生成 {self.accepted}/{total} 个题目，"
+                f"速率 {self.rate():.1f} 题/秒，预计剩余 {eta_str}")
+
+    def to_dict(self) -> Dict:
+        return {
+            'attempts': self.attempts,
+            'accepted': self.accepted,
+            'rejections': dict(self.rejections),
+            'timings': dict(self.timings),
+            'elapsed': self.elapsed(),
+            'rate': self.rate(),
+            'stop_reason': self.stop_reason,
+        }
+
+    def summary(self) -> str:
+        """生成统计报告"""
+        lines = [f"尝试: {self.attempts}，接受: {self.accepted}，耗时: {self.elapsed():.3f}s，"
+                 f"速率: {self.rate():.1f} 题/秒"]
+        lines.append("拒绝原因: " + ", ".join(f"{reason}={count}" for reason, count in self.rejections.items()))
+        lines.append("阶段耗时: " + ", ".join(f"{stage}={seconds:.3f}s" for stage, seconds in self.timings.items()))
+        if self.stop_reason is not None:
+            lines.append(f"提前停止: {self.stop_reason}")
+        return "\n".join(lines)
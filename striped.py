@@ -0,0 +1,54 @@
+import threading
+from typing import Any, Hashable, Optional
+
+
+class StripedSet:
+    """按哈希分段加锁的查重集合，可在线程池中共享
+
+    除普通的 add / in 外，还支持 claim：多个线程为同一个键登记优先级，
+    最终由优先级最小者持有该键，结果与线程调度顺序无关。
+    """
+
+    def __init__(self, stripes: int = 64):
+        self._stripes = [{} for _ in range(stripes)]
+        self._locks = [threading.Lock() for _ in range(stripes)]
+
+    def _index(self, key: Hashable) -> int:
+        return hash(key) % len(self._stripes)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._stripes[self._index(key)]
+
+    def __len__(self) -> int:
+        return sum(len(stripe) for stripe in self._stripes)
+
+    def add(self, key: Hashable):
+        index = self._index(key)
+        with self._locks[index]:
+            self._stripes[index].setdefault(key, None)
+
+    def add_if_absent(self, key: Hashable) -> bool:
+        """原子地检查并插入，插入成功返回 True"""
+        index = self._index(key)
+        with self._locks[index]:
+            stripe = self._stripes[index]
+            if key in stripe:
+                return False
+            stripe[key] = None
+            return True
+
+    def claim(self, key: Hashable, priority: Any):
+        """为键登记优先级，保留最小者；已通过 add 加入的键不可再被持有"""
+        index = self._index(key)
+        with self._locks[index]:
+            stripe = self._stripes[index]
+            if key not in stripe:
+                stripe[key] = priority
+            else:
+                current = stripe[key]
+                if current is not None and priority < current:
+                    stripe[key] = priority
+
+    def owner(self, key: Hashable) -> Optional[Any]:
+        """返回持有该键的优先级（通过 add 加入或不存在时为 None）"""
+        return self._stripes[self._index(key)].get(key)
@@ -6,8 +6,25 @@ from expression import Expression
 from validator import ExpressionValidator
 from grader import ExerciseGrader
 from utils import parse_arguments, generate_exercises, save_to_file
+from benchmark import run_scenario, compare_results, MAX_PASSES
+from stats import GenerationStats
+from profiler import PhaseProfiler
+from lexer import tokenize, main_operator, count_operators
+from vectorized import HAS_NUMPY
+from striped import StripedSet
+from shard import parse_shard, merge_shards, shard_filenames, shard_of
+from numeric import BACKENDS, get_backend
+from budget import GenerationBudget
+from expression import GenerationExhausted
+from bank import ExerciseBank, build_bank
+from memo import DEFAULT_MEMO_SIZE, MemoCache
+from pipeline import GradingPipeline
+import time
+import random
+import threading
 import sys
 from io import StringIO
+from contextlib import redirect_stdout
 
 
 class TestFraction(unittest.TestCase):
@@ -366,5 +383,590 @@ class TestMainFunctionality(unittest.TestCase):
         os.unlink(ans_filename)
 
 
+class TestBenchmark(unittest.TestCase):
+    """测试性能基准工具"""
+
+    def test_run_scenario(self):
+        """测试场景结果字段"""
+        result = run_scenario('dedup', 200, 10, seed=1)
+        self.assertEqual(result['ops'], 200)
+        self.assertGreater(result['throughput_ops_s'], 0)
+        self.assertLessEqual(result['latency_us']['p50'], result['latency_us']['p99'])
+        self.assertGreater(result['peak_memory_bytes'], 0)
+        self.assertGreaterEqual(result['passes'], 3)
+        self.assertTrue(result['measured_s'] >= 0.2 or result['passes'] == MAX_PASSES)
+
+    def test_dedup_inputs_distinct_beyond_pool(self):
+        """测试复用表达式池时各轮的查重键互不相同"""
+        from benchmark import _distinct_cycle
+        pool = ["1 + 2", "2 + 1", "3/4 × 5", "(2'1/3 - 1) ÷ 4"]
+        items = _distinct_cycle(pool, 11, 10)
+        self.assertEqual(items[:4], pool)
+        validator = ExpressionValidator()
+        # 只有第一轮的 "1 + 2" 与 "2 + 1" 重复
+        self.assertEqual(sum(validator.try_add(expr) for expr in items), 10)
+
+    def test_compare_results(self):
+        """测试基线比较"""
+        baseline = [{'scenario': 'dedup', 'count': 100, 'range': 10,
+                     'throughput_ops_s': 1000.0, 'peak_memory_bytes': 1000}]
+        ok = [dict(baseline[0], throughput_ops_s=900.0, peak_memory_bytes=1100)]
+        slow = [dict(baseline[0], throughput_ops_s=700.0)]
+        fat = [dict(baseline[0], peak_memory_bytes=1500)]
+
+        self.assertEqual(compare_results(ok, baseline, 0.2), [])
+        self.assertEqual(len(compare_results(slow, baseline, 0.2)), 1)
+        self.assertEqual(len(compare_results(fat, baseline, 0.2)), 1)
+
+        # 累计计时过短的结果不比较吞吐量
+        short = [dict(slow[0], measured_s=0.01)]
+        self.assertEqual(compare_results(short, baseline, 0.2), [])
+        self.assertEqual(len(compare_results(short, baseline, 0.2, min_duration=0)), 1)
+
+
+class TestGenerationStats(unittest.TestCase):
+    """测试生成遥测"""
+
+    def test_generate_with_stats(self):
+        """测试生成统计计数"""
+        stats = GenerationStats()
+        exercises = generate_exercises(200, 10, stats)
+        self.assertEqual(stats.accepted, len(exercises))
+        self.assertGreaterEqual(stats.attempts, stats.accepted)
+        self.assertTrue(all(seconds >= 0 for seconds in stats.timings.values()))
+        self.assertIn("拒绝原因", stats.summary())
+
+    def test_validator_rejection_reasons(self):
+        """测试验证器记录拒绝原因"""
+        stats = GenerationStats()
+        validator = ExpressionValidator(stats)
+        validator.validate_constraints("1 + 2 + 3 + 4 + 5", Fraction(15))
+        validator.add_expression("1 + 2")
+        validator.validate_constraints("2 + 1", Fraction(3))
+        self.assertEqual(stats.rejections['operator_limit'], 1)
+        self.assertEqual(stats.rejections['duplicate'], 1)
+
+    def test_invalid_operand_reason(self):
+        """测试操作数生成失败单独计为 invalid_operand"""
+        stats = GenerationStats()
+        expression = Expression(stats, random.Random(1))
+        for _ in range(20):
+            try:
+                expression.generate_expression(1)
+            except GenerationExhausted:
+                pass
+        # -r 1 时操作数只能为 0，真正的除数为 0（如 0 ÷ 0）仍计入 zero_divisor
+        self.assertGreater(stats.rejections['invalid_operand'], stats.rejections['zero_divisor'])
+
+    def test_progress_line(self):
+        """测试进度行"""
+        stats = GenerationStats()
+        stats.accepted = 10
+        self.assertIn("10/100", stats.progress_line(100))
+
+
+class TestPhaseProfiler(unittest.TestCase):
+    """测试分阶段性能分析"""
+
+    def test_disabled(self):
+        """测试未启用时不产生输出"""
+        profiler = PhaseProfiler()
+        with profiler.phase('generate'):
+            generate_exercises(10, 10)
+        self.assertEqual(profiler.phases, {})
+
+    def test_cprofile_and_memory(self):
+        """测试 cProfile 与内存快照输出"""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            profiler = PhaseProfiler('cprofile', tmp_dir, memory=True)
+            with profiler.phase('generate'):
+                generate_exercises(10, 10)
+            profiler.write_summary()
+            files = set(os.listdir(tmp_dir))
+            self.assertTrue({'generate.pstats', 'generate.txt', 'generate.memory.txt', 'summary.txt'} <= files)
+            self.assertGreater(profiler.phases['generate']['peak_memory'], 0)
+
+    def test_sample(self):
+        """测试采样模式输出"""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            profiler = PhaseProfiler('sample', tmp_dir)
+            with profiler.phase('generate'):
+                generate_exercises(200, 10)
+            self.assertIn('generate.sample.txt', os.listdir(tmp_dir))
+
+
+class TestLexer(unittest.TestCase):
+    """测试共享词法分析器"""
+
+    def test_tokenize(self):
+        """测试记号切分"""
+        self.assertEqual(tokenize("(1/2 + 2'1/3) × 4"),
+                         ('(', '1/2', '+', "2'1/3", ')', '×', '4'))
+        self.assertEqual(count_operators(tokenize("1 + 2 × 3 - 4 ÷ 5")), 4)
+
+    def test_main_operator(self):
+        """测试最外层运算符"""
+        self.assertIsNone(main_operator(tokenize("3")))
+        self.assertEqual(main_operator(tokenize("1 × 2 + 3")), '+')
+        self.assertEqual(main_operator(tokenize("(1 + 2) × 3")), '×')
+        self.assertEqual(main_operator(tokenize("(1 + 2)")), '+')
+        self.assertEqual(main_operator(tokenize("(1 + 2) × (3 - 1)")), '×')
+
+
+class TestGraderBackends(unittest.TestCase):
+    """测试批改后端结果一致"""
+
+    def setUp(self):
+        self.exercises = ["1 + 2 = ", "3 - 1 = ", "", "1 ÷ 0 = ", "1/2 × 1/3 = ", "abc = "]
+        self.answers = ["3", "1", "", "1", "1/6", "1"]
+        with tempfile.NamedTemporaryFile(mode='w', delete=False, encoding='utf-8') as ex_file, \
+                tempfile.NamedTemporaryFile(mode='w', delete=False, encoding='utf-8') as ans_file:
+            ex_file.write('\n'.join(self.exercises))
+            ans_file.write('\n'.join(self.answers))
+            self.ex_filename = ex_file.name
+            self.ans_filename = ans_file.name
+
+    def tearDown(self):
+        os.unlink(self.ex_filename)
+        os.unlink(self.ans_filename)
+
+    def test_scalar_backend(self):
+        """测试逐题比较后端"""
+        grader = ExerciseGrader(backend='scalar')
+        self.assertEqual(grader.grade_exercises(self.ex_filename, self.ans_filename), ([1, 5], [2, 4, 6]))
+
+    @unittest.skipUnless(HAS_NUMPY, "需要 numpy")
+    def test_numpy_backend(self):
+        """测试 numpy 批量比较后端与逐题比较一致"""
+        grader = ExerciseGrader(backend='numpy')
+        self.assertEqual(grader.grade_exercises(self.ex_filename, self.ans_filename), ([1, 5], [2, 4, 6]))
+
+    @unittest.skipUnless(HAS_NUMPY, "需要 numpy")
+    def test_numpy_overflow_fallback(self):
+        """测试超出 int64 安全范围的行退回整数比较"""
+        from vectorized import fractions_equal
+        big = 3 ** 50
+        equal = fractions_equal([1, big, big], [2, 1, 1], [2, big, big + 1], [4, 1, 1])
+        self.assertEqual(equal.tolist(), [True, True, False])
+
+    def test_unknown_backend(self):
+        """测试未知后端"""
+        with self.assertRaises(ValueError):
+            ExerciseGrader(backend='gpu')
+
+    def test_default_backend_is_scalar(self):
+        """测试默认逐题比较，auto 对小批量也不使用 numpy"""
+        self.assertEqual(ExerciseGrader().backend, 'scalar')
+        grader = ExerciseGrader(backend='auto')
+        grader._grade_batched = None
+        self.assertEqual(grader.grade_exercises(self.ex_filename, self.ans_filename), ([1, 5], [2, 4, 6]))
+
+    def test_startup_does_not_import_numpy(self):
+        """测试启动时不导入 numpy"""
+        import subprocess
+        code = "import sys, main; print('numpy' in sys.modules)"
+        output = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout
+        self.assertEqual(output.strip(), 'False')
+
+
+class TestConcurrentGeneration(unittest.TestCase):
+    """测试独立随机数生成器与多线程生成"""
+
+    def test_instance_rng(self):
+        """测试相同种子的实例生成相同表达式"""
+        a = Expression(rng=random.Random(42))
+        b = Expression(rng=random.Random(42))
+        for _ in range(50):
+            self.assertEqual(a.generate_expression(10)[0], b.generate_expression(10)[0])
+
+    def test_parallel_deterministic(self):
+        """测试多线程生成可复现且无重复"""
+        first = generate_exercises(500, 10, workers=4, seed=3)
+        second = generate_exercises(500, 10, workers=4, seed=3)
+        self.assertEqual(first, second)
+        self.assertEqual(len(first), 500)
+
+        validator = ExpressionValidator()
+        for expr, _ in first:
+            self.assertFalse(validator.is_duplicate(expr))
+            validator.add_expression(expr)
+
+    def test_striped_set_claim(self):
+        """测试并发登记时由最小优先级持有"""
+        table = StripedSet(stripes=4)
+        threads = [threading.Thread(target=lambda p=p: [table.claim(k, p) for k in range(100)])
+                   for p in range(8, 0, -1)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(table), 100)
+        self.assertTrue(all(table.owner(k) == 1 for k in range(100)))
+        self.assertTrue(table.add_if_absent('x'))
+        self.assertFalse(table.add_if_absent('x'))
+        self.assertIn('x', table)
+
+    def test_try_add_shared(self):
+        """测试共享 StripedSet 时 try_add 对每个查重键只成功一次"""
+        table = StripedSet(stripes=4)
+        expressions = [f"{a} + {b}" for a in range(20) for b in range(20)]
+        added = []
+
+        def worker():
+            validator = ExpressionValidator(expressions=table)
+            added.extend(expr for expr in expressions if validator.try_add(expr))
+
+        threads = [threading.Thread(target=worker) for _ in range(6)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        # 加法交换律视为重复：20 × 21 / 2 个查重键
+        self.assertEqual(len(added), 210)
+        self.assertEqual(len(table), 210)
+
+        validator = ExpressionValidator()
+        self.assertTrue(validator.try_add("1 + 2"))
+        self.assertFalse(validator.try_add("2 + 1"))
+
+
+class TestSharding(unittest.TestCase):
+    """测试分片生成与合并"""
+
+    def test_parse_shard(self):
+        """测试分片参数解析"""
+        self.assertEqual(parse_shard("1/4"), (1, 4))
+        for text in ("4/4", "-1/4", "a/b", "1"):
+            with self.assertRaises(Exception):
+                parse_shard(text)
+
+    def test_shards_disjoint_and_merge(self):
+        """测试各分片互不重复且合并校验通过"""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            exercise_files = []
+            for index in range(3):
+                exercises = generate_exercises(100, 10, seed=1, shard=(index, 3))
+                self.assertEqual(len(exercises), 100)
+                ex_name, ans_name = shard_filenames((index, 3))
+                save_to_file([ex[0] for ex in exercises], os.path.join(tmp_dir, ex_name))
+                save_to_file([ex[1] for ex in exercises], os.path.join(tmp_dir, ans_name))
+                exercise_files.append(os.path.join(tmp_dir, ex_name))
+
+            ex_out = os.path.join(tmp_dir, 'Exercises.txt')
+            ans_out = os.path.join(tmp_dir, 'Answers.txt')
+            self.assertEqual(merge_shards(exercise_files, ex_out, ans_out), 300)
+
+            validator = ExpressionValidator()
+            with open(ex_out, encoding='utf-8') as f:
+                for line in f:
+                    expr = line.split('=')[0]
+                    self.assertFalse(validator.is_duplicate(expr))
+                    validator.add_expression(expr)
+
+            # 混入不属于该分片的题目时合并失败（"1+2" 的查重键落在分区 2）
+            self.assertEqual(shard_of(validator.fingerprint("1 + 2"), 3), 2)
+            with open(exercise_files[0], 'a', encoding='utf-8') as f:
+                f.write("1 + 2 = \n")
+            with open(exercise_files[0].replace('Exercises', 'Answers'), 'a', encoding='utf-8') as f:
+                f.write("3\n")
+            with self.assertRaises(ValueError):
+                merge_shards(exercise_files, ex_out, ans_out)
+
+
+class TestNumericBackends(unittest.TestCase):
+    """测试数值后端行为一致"""
+
+    def test_arithmetic_and_format(self):
+        """测试各后端运算与格式化一致"""
+        for name in BACKENDS:
+            numeric = get_backend(name)
+            a = numeric.from_string("1/2")
+            b = numeric.from_string("2'1/3")
+            self.assertEqual(numeric.to_string(numeric.add(a, b)), "2'5/6", name)
+            self.assertEqual(numeric.to_string(numeric.sub(b, a)), "1'5/6", name)
+            self.assertEqual(numeric.to_string(numeric.mul(a, b)), "1'1/6", name)
+            self.assertEqual(numeric.to_string(numeric.div(a, b)), "3/14", name)
+            self.assertTrue(numeric.lt(a, b), name)
+            self.assertTrue(numeric.eq(numeric.make(2, 4), a), name)
+            self.assertTrue(numeric.is_proper(a), name)
+            self.assertFalse(numeric.is_proper(b), name)
+
+    def test_same_output_across_backends(self):
+        """测试相同种子下各后端生成与批改结果一致"""
+        outputs = []
+        for name in BACKENDS:
+            expression = Expression(rng=random.Random(11), backend=get_backend(name))
+            outputs.append([(expr, expression.backend.to_string(result))
+                            for expr, result in (expression.generate_expression(10) for _ in range(100))])
+            evaluated = [get_backend(name).to_string(expression.evaluate_expression(expr))
+                         for expr, _ in outputs[-1]]
+            self.assertEqual(evaluated, [answer for _, answer in outputs[-1]], name)
+        self.assertTrue(all(output == outputs[0] for output in outputs))
+
+
+class TestGenerationBudget(unittest.TestCase):
+    """测试生成预算"""
+
+    def test_saturation_stops_early(self):
+        """测试题目空间饱和时提前停止"""
+        stats = GenerationStats()
+        exercises = generate_exercises(1000, 1, stats, seed=1)
+        self.assertLess(len(exercises), 1000)
+        self.assertEqual(stats.stop_reason, GenerationBudget.SATURATED)
+
+    def test_dense_request_completes(self):
+        """测试接受率低但题目空间未饱和时仍生成全部题目"""
+        stats = GenerationStats()
+        exercises = generate_exercises(3000, 2, stats, seed=1)
+        self.assertEqual(len(exercises), 3000)
+        self.assertIsNone(stats.stop_reason)
+
+    def test_saturation_needs_consecutive_windows(self):
+        """测试单个重复率很高的窗口不会判定为饱和"""
+        budget = GenerationBudget(100, window=10, patience=3)
+        for _ in range(2):
+            budget.record(duplicate=True, count=10)
+        budget.record(accepted=True, count=1)
+        budget.record(count=9)
+        budget.record(duplicate=True, count=10)
+        self.assertIsNone(budget.stop_reason)
+        for _ in range(2):
+            budget.record(duplicate=True, count=10)
+        self.assertEqual(budget.stop_reason, GenerationBudget.SATURATED)
+
+    def test_exhausted_reports_attempts(self):
+        """测试数值范围过小时停止原因为 exhausted，警告中的尝试次数与统计一致"""
+        stats = GenerationStats()
+        output = StringIO()
+        with redirect_stdout(output):
+            exercises = generate_exercises(10, 0, stats, seed=1)
+        self.assertEqual(exercises, [])
+        self.assertEqual(stats.stop_reason, GenerationBudget.EXHAUSTED)
+        self.assertGreater(stats.attempts, 0)
+        self.assertIn(f"尝试次数: {stats.attempts}，停止原因: exhausted", output.getvalue())
+        self.assertIn("-r", output.getvalue())
+
+    def test_deadline(self):
+        """测试时间预算内返回部分结果"""
+        stats = GenerationStats()
+        start = time.perf_counter()
+        exercises = generate_exercises(10 ** 6, 50, stats, time_budget=0.2)
+        self.assertLess(time.perf_counter() - start, 2)
+        self.assertLess(len(exercises), 10 ** 6)
+        self.assertEqual(stats.stop_reason, GenerationBudget.DEADLINE)
+
+    def test_adaptive_limit(self):
+        """测试尝试上限随接受率调整"""
+        budget = GenerationBudget(100, window=10, slack=2)
+        budget.record(accepted=True, count=5)
+        budget.record(count=5)
+        # 接受率 0.5，剩余 95 题，上限为 10 + 2 * 95 / 0.5
+        self.assertEqual(budget.limit, 10 + 380)
+        self.assertFalse(budget.exhausted())
+
+    def test_expression_attempt_bound(self):
+        """测试单次生成的尝试上限与期限"""
+        expression = Expression()
+        with self.assertRaises(GenerationExhausted):
+            expression.generate_expression(10, max_attempts=0)
+        with self.assertRaises(GenerationExhausted):
+            expression.generate_expression(10, deadline=time.perf_counter() - 1)
+
+
+class TestExerciseBank(unittest.TestCase):
+    """测试预生成题库与随机抽题"""
+
+    def test_build_and_sample(self):
+        """测试按索引不放回抽题及筛选"""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            prefix = os.path.join(tmp_dir, 'bank')
+            self.assertEqual(build_bank(500, 10, prefix, seed=1), 500)
+
+            parser = Expression()
+            with ExerciseBank(prefix) as bank:
+                self.assertEqual(len(bank), 500)
+                exercises = bank.sample(50, random.Random(2))
+                self.assertEqual(len(exercises), 50)
+                self.assertEqual(len(set(exercises)), 50)
+                for exercise, answer in exercises:
+                    result = parser.evaluate_expression(exercise.split('=')[0])
+                    self.assertEqual(result, Fraction.from_string(answer))
+
+                filtered = bank.sample(20, random.Random(3), operators=1, max_range=5)
+                self.assertEqual(len(set(filtered)), len(filtered))
+                for exercise, _ in filtered:
+                    tokens = tokenize(exercise.split('=')[0])
+                    self.assertEqual(count_operators(tokens), 1)
+                    for token in tokens:
+                        if token.isdigit():
+                            self.assertLess(int(token), 5)
+                        elif '/' in token:
+                            self.assertLessEqual(int(token.split('/')[1]), 5)
+
+                limited = bank.sample(100, random.Random(5), max_operators=2)
+                self.assertEqual(len(limited), 100)
+                self.assertTrue(all(count_operators(tokenize(ex.split('=')[0])) <= 2 for ex, _ in limited))
+
+                # 符合条件的题目不足时返回全部匹配项
+                everything = bank.sample(1000, random.Random(4), max_range=10)
+                self.assertEqual(len(everything), 500)
+
+
+class TestMemoCache(unittest.TestCase):
+    """测试求值子表达式缓存"""
+
+    def test_lru_eviction(self):
+        """测试容量上限与最近使用顺序"""
+        cache = MemoCache(2)
+        cache.put('a', 1)
+        cache.put('b', 2)
+        self.assertEqual(cache.get('a'), 1)
+        cache.put('c', 3)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('c'), 3)
+        self.assertEqual((cache.hits, cache.misses, len(cache)), (2, 1, 2))
+        with self.assertRaises(ValueError):
+            MemoCache(0)
+
+    def test_evaluator_memo(self):
+        """测试公共子表达式只求值一次，关闭缓存时结果一致"""
+        self.assertIsNone(Expression().memo)
+        expression = Expression(memo_size=DEFAULT_MEMO_SIZE)
+        self.assertEqual(expression.evaluate_expression("(1/2 + 1/3) × 6"), Fraction(5))
+        self.assertEqual(expression.evaluate_expression("2 - (1/2+1/3)"), Fraction(7, 6))
+        self.assertEqual(expression.memo.hits, 1)
+        self.assertEqual(expression.evaluate_expression("(1/2 + 1/3) × 6"), Fraction(5))
+        self.assertEqual(expression.memo.hits, 2)
+
+        plain = Expression(memo_size=0)
+        self.assertIsNone(plain.memo)
+        self.assertEqual(plain.evaluate_expression("(1/2 + 1/3) × 6"), Fraction(5))
+
+        # 求值失败的表达式不写入缓存
+        with self.assertRaises(ValueError):
+            expression.evaluate_expression("1 ÷ (1 - 1)")
+        self.assertIsNone(expression.memo.get(tokenize("1 ÷ (1 - 1)")))
+
+
+class TestLargeExpressions(unittest.TestCase):
+    """测试运算符上限可配置与大规模表达式"""
+
+    def test_generate_with_max_operators(self):
+        """测试生成题目的运算符个数不超过上限"""
+        exercises = generate_exercises(200, 10000, seed=1, max_operators=10)
+        self.assertEqual(len(exercises), 200)
+        counts = [count_operators(tokenize(ex.split('=')[0])) for ex, _ in exercises]
+        self.assertLessEqual(max(counts), 10)
+        self.assertGreater(max(counts), 3)
+
+        grader = ExerciseGrader()
+        for exercise, answer in exercises[:20]:
+            result = grader.expression_parser.evaluate_expression(exercise.split('=')[0])
+            self.assertEqual(grader.expression_parser.backend.to_string(result), answer)
+
+    def test_no_recursion_limit(self):
+        """测试深层嵌套与超长表达式不受递归深度限制"""
+        depth = sys.getrecursionlimit() + 100
+        expression = Expression(memo_size=0)
+        self.assertEqual(expression.evaluate_expression("(" * depth + "1 + 2" + ")" * depth), Fraction(3))
+        memo_expression = Expression(memo_size=DEFAULT_MEMO_SIZE)
+        self.assertEqual(memo_expression.evaluate_expression("(" * depth + "1" + ")" * depth + " × 2"), Fraction(2))
+
+        operands = [Fraction(1)] * depth
+        expr, result = expression._build_expression(operands, ['+'] * (depth - 1))
+        self.assertEqual(result, Fraction(depth))
+        self.assertEqual(count_operators(tokenize(expr)), depth - 1)
+
+        for malformed in ("(1 + 2", "1 + 2)", "1 +"):
+            with self.assertRaises(ValueError):
+                expression.evaluate_expression(malformed)
+
+    def test_group_operands_stay_inside(self):
+        """测试括号内的运算符不会取用括号外的操作数，且格式错误的括号不写入缓存"""
+        for memo_size in (0, DEFAULT_MEMO_SIZE):
+            expression = Expression(memo_size=memo_size)
+            for malformed in ("(1 (-3))", "(× 2)"):
+                with self.assertRaises(ValueError):
+                    expression.evaluate_expression(malformed)
+            with self.assertRaises(ValueError):
+                expression.evaluate_expression("-3")
+
+    def test_nesting_cost_is_linear(self):
+        """测试开启 memo 时深层嵌套的缓存键总长度随嵌套深度线性增长"""
+        depth = 5000
+        expr = "(" * depth + "1 + 2" + ")" * depth
+        expression = Expression(memo_size=DEFAULT_MEMO_SIZE)
+        keys = []
+        get, put = expression.memo.get, expression.memo.put
+        expression.memo.get = lambda key: keys.append(len(key)) or get(key)
+        expression.memo.put = lambda key, value: keys.append(len(key)) or put(key, value)
+
+        self.assertEqual(expression.evaluate_expression(expr), Fraction(3))
+        # 缓存键的总长度与表达式长度成正比（不限制键长时约为嵌套深度的平方）
+        self.assertLessEqual(sum(keys), 4 * len(expression._tokenize(expr)))
+
+
+class TestPipelinedGrading(unittest.TestCase):
+    """测试流水线批改"""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.ex_file = os.path.join(self.tmp_dir.name, 'Exercises.txt')
+        self.ans_file = os.path.join(self.tmp_dir.name, 'Answers.txt')
+        exercises = generate_exercises(300, 10, seed=1)
+        answers = [ex[1] for ex in exercises]
+        answers[5] = "999"
+        answers[100] = "x"
+        lines = [ex[0] for ex in exercises]
+        lines[50] = ""
+        save_to_file(lines, self.ex_file)
+        save_to_file(answers, self.ans_file)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_matches_sequential(self):
+        """测试流水线结果与逐步批改一致"""
+        grader = ExerciseGrader(backend='scalar')
+        expected = grader.grade_exercises(self.ex_file, self.ans_file)
+        self.assertEqual(len(expected[1]), 2)
+        for workers in (1, 3):
+            self.assertEqual(grader.grade_exercises_pipelined(self.ex_file, self.ans_file, workers, chunk_size=7),
+                             expected)
+
+        results = grader.grade_files_pipelined([(self.ex_file, self.ans_file)] * 3, workers=2, chunk_size=64)
+        self.assertEqual(results, [expected] * 3)
+
+        with self.assertRaises(FileNotFoundError):
+            grader.grade_exercises_pipelined(os.path.join(self.tmp_dir.name, 'missing.txt'), self.ans_file)
+
+    def test_matches_sequential_encoding_and_newlines(self):
+        """测试 CR 换行与整文件 GBK 编码的批改结果与逐步批改一致"""
+        exercises = ["1 + 2 = ", "3 × 2 = ", "１ + 1 = ", "2 - 1 = "]
+        answers = ["3", "5", "2", "1"]
+        grader = ExerciseGrader(backend='scalar')
+        for newline, encoding in (('\r', 'utf-8'), ('\r\n', 'gbk'), ('\r', 'gbk')):
+            with open(self.ex_file, 'wb') as f:
+                f.write(newline.join(exercises).encode(encoding))
+            with open(self.ans_file, 'wb') as f:
+                f.write(newline.join(answers).encode(encoding))
+            expected = grader.grade_exercises(self.ex_file, self.ans_file)
+            self.assertEqual(expected, ([1, 3, 4], [2]))
+            self.assertEqual(grader.grade_exercises_pipelined(self.ex_file, self.ans_file, chunk_size=3), expected)
+
+    def test_reorders_chunks(self):
+        """测试先完成的后续块不会打乱顺序"""
+        def grade_chunk(exercises, answers, start):
+            if start == 1:
+                time.sleep(0.05)
+            return list(range(start, start + len(exercises))), []
+
+        pipeline = GradingPipeline(grade_chunk, workers=3, chunk_size=10, max_in_flight=4)
+        correct, wrong = pipeline.run([(self.ex_file, self.ans_file)])[0]
+        self.assertEqual(correct, list(range(1, 301)))
+        self.assertEqual(wrong, [])
+
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
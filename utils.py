@@ -1,9 +1,25 @@
 import argparse
+import random
 import sys
-from typing import List, Tuple
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Tuple
 from fraction import Fraction
-from expression import Expression
+from expression import Expression, GenerationExhausted
 from validator import ExpressionValidator
+from stats import GenerationStats
+from profiler import add_profile_arguments
+from striped import StripedSet
+from shard import Shard, parse_shard, shard_of
+from numeric import BACKENDS, get_backend
+from budget import GenerationBudget
+from memo import DEFAULT_MEMO_SIZE
+from lexer import DEFAULT_MAX_OPERATORS, MAX_OPERATORS
+
+# 进度行的最小输出间隔（秒）
+PROGRESS_INTERVAL = 1.0
+# 多线程生成时每个线程每轮至少生成的候选数
+MIN_BATCH = 16
 
 
 def parse_arguments():
@@ -16,6 +32,23 @@ def parse_arguments():
 
     parser.add_argument('-r', type=int, help='数值范围')
     parser.add_argument('-a', type=str, help='答案文件路径')
+    parser.add_argument('--max-operators', type=int, default=DEFAULT_MAX_OPERATORS,
+                        help=f'每道题的运算符个数上限（1~{MAX_OPERATORS}，默认 {DEFAULT_MAX_OPERATORS}）')
+    parser.add_argument('--stats', action='store_true', help='输出生成过程的统计信息')
+    parser.add_argument('--seed', type=int, help='随机种子（指定后结果可复现）')
+    parser.add_argument('--workers', type=int, default=1, help='生成题目的线程数')
+    parser.add_argument('--deadline', type=float, help='生成时间预算（秒），超时返回已生成的部分题目')
+    parser.add_argument('--backend', choices=sorted(BACKENDS), default='fraction',
+                        help='分数运算的数值后端（fraction: 自带实现，stdlib: fractions.Fraction，tuple: 整数元组）')
+    parser.add_argument('--shard', type=parse_shard,
+                        help='分片生成 i/N（i 从 0 开始），各分片输出互不重复，可用 shard.py 合并')
+    parser.add_argument('--memo-size', type=int, default=0,
+                        help=f'批改时子表达式缓存的容量（默认 0 即关闭，重复批改同一批题目时可设为 {DEFAULT_MEMO_SIZE}）')
+    parser.add_argument('--pipeline-workers', type=int, default=0,
+                        help='批改时使用流水线（读取与求值重叠）的求值线程数，0 表示逐步批改')
+    parser.add_argument('--bank', type=str,
+                        help='从预生成题库（bank.py build 生成的文件前缀）随机抽题，-r 作为数值范围上限')
+    add_profile_arguments(parser)
 
     args = parser.parse_args()
 
@@ -26,46 +59,251 @@ def parse_arguments():
     if args.e is not None and args.a is None:
         parser.error("使用 -e 参数时必须指定 -a 参数")
 
+    if args.workers < 1:
+        parser.error("--workers 必须为正整数")
+
+    if not 1 <= args.max_operators <= MAX_OPERATORS:
+        parser.error(f"--max-operators 应在 1~{MAX_OPERATORS} 之间")
+
+    if args.pipeline_workers < 0:
+        parser.error("--pipeline-workers 不能为负数")
+
+    if args.memo_size < 0:
+        parser.error("--memo-size 不能为负数")
+
+    if args.bank is not None:
+        # 题库模式只抽题不生成，生成相关的参数不起作用
+        for name, value in (('--shard', args.shard), ('--deadline', args.deadline)):
+            if value is not None:
+                parser.error(f"--bank 不能与 {name} 同时使用")
+        if args.workers != 1:
+            parser.error("--bank 不能与 --workers 同时使用")
+
     return args
 
 
-def generate_exercises(num_exercises: int, max_range: int) -> List[Tuple[str, str]]:
-    """生成练习题和答案"""
-    exercises = []
-    expression_gen = Expression()
-    validator = ExpressionValidator()
+def generate_exercises(num_exercises: int, max_range: int,
+                       stats: Optional[GenerationStats] = None,
+                       workers: int = 1, seed: Optional[int] = None,
+                       shard: Optional[Shard] = None,
+                       time_budget: Optional[float] = None,
+                       max_operators: int = DEFAULT_MAX_OPERATORS) -> List[Tuple[str, str]]:
+    """生成练习题和答案（传入 stats 可获取拒绝原因、阶段耗时等统计）
+
+    指定 seed 时使用独立的随机数生成器，相同的 seed 与 workers 得到相同的结果；
+    workers > 1 时使用线程池并行生成。
+    shard=(i, N) 时只接受查重键落在第 i 个哈希分区的题目，尝试上限相应放大 N 倍。
+    time_budget 为秒数，超时、尝试次数用尽或题目空间饱和时返回已生成的部分结果，
+    停止原因记录在 stats.stop_reason。
+    max_operators 为每道题的运算符个数上限。
+    """
+    if stats is None:
+        stats = GenerationStats()
+    if shard is not None and seed is not None:
+        # 各分片使用不同的随机序列，避免 N 个分片重复生成同一批候选
+        seed = f"{seed}-shard-{shard[0]}-of-{shard[1]}"
+    budget = GenerationBudget(num_exercises, time_budget, _max_attempts(num_exercises, shard))
+    if workers > 1:
+        exercises = _generate_exercises_parallel(num_exercises, max_range, stats, budget, workers, seed, shard,
+                                                 max_operators)
+    else:
+        exercises = _generate_exercises_serial(num_exercises, max_range, stats, budget, seed, shard,
+                                               max_operators)
 
-    generated_count = 0
-    attempt_count = 0
-    max_attempts = num_exercises * 200  # 增加尝试次数
+    stats.stop_reason = budget.stop_reason
+    if len(exercises) < num_exercises:
+        print(f"警告: 只生成了 {len(exercises)} 个有效题目"
+              f"（尝试次数: {stats.attempts}，停止原因: {budget.stop_reason}）")
+        if budget.stop_reason == GenerationBudget.EXHAUSTED:
+            print("提示: 在尝试上限内无法生成符合约束的题目，请检查数值范围 -r 是否过小")
 
-    while generated_count < num_exercises and attempt_count < max_attempts:
-        attempt_count += 1
+    return exercises
+
+
+def _generate_exercises_serial(num_exercises: int, max_range: int, stats: GenerationStats,
+                               budget: GenerationBudget, seed: Optional[int],
+                               shard: Optional[Shard],
+                               max_operators: int = DEFAULT_MAX_OPERATORS) -> List[Tuple[str, str]]:
+    exercises = []
+    rng = random.Random(seed) if seed is not None else None
+    expression_gen = Expression(stats, rng)
+    validator = ExpressionValidator(stats)
+    perf_counter = time.perf_counter
+    last_progress = perf_counter()
+
+    while not budget.exhausted():
+        try:
+            expr, result = expression_gen.generate_expression(max_range, max_operators, deadline=budget.deadline)
+        except GenerationExhausted:
+            budget.give_up()
+            break
 
         try:
-            expr, result = expression_gen.generate_expression(max_range)
+            start = perf_counter()
+            in_shard = _in_shard(validator, expr, shard)
+            stats.add_time('dedup', perf_counter() - start)
+            if not in_shard:
+                budget.record()
+                continue
 
             # 验证表达式
-            if validator.validate_constraints(expr, result):
-                # 检查是否重复
-                if not validator.is_duplicate(expr):
-                    exercise_str = f"{expr} = "
-                    answer_str = result.to_string()
-
-                    exercises.append((exercise_str, answer_str))
-                    validator.add_expression(expr)
-                    generated_count += 1
-
-                    if generated_count % 100 == 0:
-                        print(f"已生成 {generated_count} 个题目")
+            start = perf_counter()
+            valid = validator.within_operator_limit(expr, max_operators)
+            stats.add_time('validate', perf_counter() - start)
+            if not valid:
+                budget.record()
+                continue
+
+            # 检查是否重复
+            start = perf_counter()
+            duplicate = not validator.try_add(expr)
+            if duplicate:
+                stats.reject(GenerationStats.DUPLICATE)
+            stats.add_time('dedup', perf_counter() - start)
+
+            if duplicate:
+                budget.record(duplicate=True)
+                continue
+
+            exercise_str = f"{expr} = "
+            answer_str = expression_gen.backend.to_string(result)
+
+            exercises.append((exercise_str, answer_str))
+            stats.accepted += 1
+            budget.record(accepted=True)
+
+            now = perf_counter()
+            if now - last_progress >= PROGRESS_INTERVAL:
+                print(stats.progress_line(num_exercises))
+                last_progress = now
         except (ValueError, ZeroDivisionError) as e:
+            budget.record()
             continue
 
-    if generated_count < num_exercises:
-        print(f"警告: 只生成了 {generated_count} 个有效题目（尝试次数: {attempt_count}）")
+    return exercises
+
+
+def _max_attempts(num_exercises: int, shard: Optional[Shard]) -> int:
+    return num_exercises * 200 * (shard[1] if shard is not None else 1)
+
+
+def _in_shard(validator: ExpressionValidator, expr: str, shard: Optional[Shard]) -> bool:
+    """检查表达式的查重键是否落在本分片的哈希分区内"""
+    if shard is None:
+        return True
+    index, count = shard
+    if shard_of(validator.fingerprint(expr), count) == index:
+        return True
+    validator.stats.reject(GenerationStats.OTHER_SHARD)
+    return False
+
+
+class _Worker:
+    """线程池中单个生成线程的私有状态（随机数生成器、统计、生成器）"""
+
+    def __init__(self, index: int, seed: Optional[int], table: StripedSet,
+                 max_operators: int = DEFAULT_MAX_OPERATORS):
+        self.index = index
+        self.max_operators = max_operators
+        self.stats = GenerationStats()
+        rng = random.Random(f"{seed}-{index}") if seed is not None else random.Random()
+        self.expression_gen = Expression(self.stats, rng)
+        self.validator = ExpressionValidator(self.stats, table)
+
+    def generate_batch(self, max_range: int, batch_size: int, round_index: int,
+                       shard: Optional[Shard] = None, deadline: Optional[float] = None) -> Tuple[list, int, bool]:
+        """生成一批候选题目，并以 (轮次, 线程, 序号) 为优先级登记查重键
+
+        返回 (候选列表, 实际尝试次数, 是否因期限或尝试上限而无法继续生成)。
+        """
+        stats = self.stats
+        perf_counter = time.perf_counter
+        candidates = []
+        for i in range(batch_size):
+            try:
+                expr, result = self.expression_gen.generate_expression(max_range, self.max_operators,
+                                                                       deadline=deadline)
+            except GenerationExhausted:
+                return candidates, i, True
+            except (ValueError, ZeroDivisionError):
+                continue
+
+            start = perf_counter()
+            valid = self.validator.within_operator_limit(expr, self.max_operators)
+            stats.add_time('validate', perf_counter() - start)
+            if not valid:
+                continue
+
+            start = perf_counter()
+            if not _in_shard(self.validator, expr, shard):
+                stats.add_time('dedup', perf_counter() - start)
+                continue
+            priority = (round_index, self.index, i)
+            key = self.validator.claim_expression(expr, priority)
+            stats.add_time('dedup', perf_counter() - start)
+            candidates.append((priority, key, expr, result))
+        return candidates, batch_size, False
+
+
+def _generate_exercises_parallel(num_exercises: int, max_range: int, stats: GenerationStats,
+                                 budget: GenerationBudget, workers: int, seed: Optional[int],
+                                 shard: Optional[Shard] = None,
+                                 max_operators: int = DEFAULT_MAX_OPERATORS) -> List[Tuple[str, str]]:
+    """多线程生成：各线程按轮次生成候选并在分段加锁的集合中登记，
+
+    每轮结束后按优先级顺序接受持有查重键的候选，因此结果与线程调度无关
+    （设置了时间期限时，期限到达的时刻仍取决于调度）。
+    """
+    table = StripedSet()
+    numeric = get_backend()
+    pool_workers = [_Worker(index, seed, table, max_operators) for index in range(workers)]
+    exercises = []
+
+    round_index = 0
+    last_progress = time.perf_counter()
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        while not budget.exhausted():
+            remaining = num_exercises - len(exercises)
+            batch_size = max(MIN_BATCH, -(-remaining // workers))
+            batch_size = min(batch_size, -(-budget.remaining_attempts() // workers))
+            futures = [executor.submit(worker.generate_batch, max_range, batch_size, round_index,
+                                       shard, budget.deadline)
+                       for worker in pool_workers]
+            batches = [future.result() for future in futures]
+
+            # 各批次已按 (线程, 序号) 排列，依次处理即为优先级顺序
+            for candidates, _, _ in batches:
+                for priority, key, expr, result in candidates:
+                    if len(exercises) >= num_exercises:
+                        break
+                    if table.owner(key) != priority:
+                        stats.reject(GenerationStats.DUPLICATE)
+                        budget.record(duplicate=True)
+                        continue
+                    exercises.append((f"{expr} = ", numeric.to_string(result)))
+                    stats.accepted += 1
+                    budget.record(accepted=True)
+
+            attempted = sum(count for _, count, _ in batches)
+            total_candidates = sum(len(candidates) for candidates, _, _ in batches)
+            if attempted > total_candidates:
+                budget.record(count=attempted - total_candidates)
+            if any(gave_up for _, _, gave_up in batches) and len(exercises) < num_exercises:
+                budget.give_up()
+            round_index += 1
+
+            now = time.perf_counter()
+            if now - last_progress >= PROGRESS_INTERVAL:
+                print(stats.progress_line(num_exercises))
+                last_progress = now
+
+    for worker in pool_workers:
+        stats.merge(worker.stats)
 
     return exercises
 
+
 def save_to_file(data: List[str], filename: str):
     """保存数据到文件"""
     try:
@@ -1,11 +1,15 @@
-import re
-from typing import List, Set
+from typing import List, Optional, Sequence, Set
 from fraction import Fraction
+from stats import GenerationStats
+from lexer import DEFAULT_MAX_OPERATORS, PRIORITY, count_operators, tokenize
+from striped import StripedSet
 
 
 class ExpressionValidator:
-    def __init__(self):
-        self.generated_expressions: Set[str] = set()
+    def __init__(self, stats: Optional[GenerationStats] = None, expressions=None):
+        """expressions 为查重集合，缺省为普通 set；多线程共享时传入 StripedSet"""
+        self.generated_expressions: Set[str] = expressions if expressions is not None else set()
+        self.stats = stats if stats is not None else GenerationStats()
 
     def is_duplicate(self, expr: str) -> bool:
         """检查表达式是否重复"""
@@ -18,65 +22,77 @@ class ExpressionValidator:
         normalized = self._normalize_expression(expr)
         self.generated_expressions.add(normalized)
 
+    def try_add(self, expr: str) -> bool:
+        """表达式不重复时加入已生成集合并返回 True，重复时返回 False
+
+        共享 StripedSet 时检查与插入是原子的；is_duplicate + add_expression 的组合只适用于单线程。
+        """
+        normalized = self._normalize_expression(expr)
+        expressions = self.generated_expressions
+        if isinstance(expressions, StripedSet):
+            return expressions.add_if_absent(normalized)
+        if normalized in expressions:
+            return False
+        expressions.add(normalized)
+        return True
+
+    def fingerprint(self, expr: str) -> str:
+        """表达式的查重键（规范化形式）"""
+        return self._normalize_expression(expr)
+
+    def claim_expression(self, expr: str, priority) -> str:
+        """为表达式登记优先级（需 StripedSet），返回规范化后的查重键"""
+        normalized = self._normalize_expression(expr)
+        self.generated_expressions.claim(normalized, priority)
+        return normalized
+
     def _normalize_expression(self, expr: str) -> str:
         """规范化表达式以检查重复"""
-        # 移除空格
-        expr = expr.replace(' ', '')
-
         # 构建表达式树并规范化
-        return self._build_normalized_tree(expr)
+        return self._build_normalized_tree(tokenize(expr))
 
-    def _build_normalized_tree(self, expr: str) -> str:
+    def _build_normalized_tree(self, tokens: Sequence[str]) -> str:
         """构建规范化的表达式树表示"""
-        if '(' not in expr and ')' not in expr:
+        if '(' not in tokens and ')' not in tokens:
             # 简单表达式，直接排序操作数
-            return self._normalize_simple_expression(expr)
+            return self._normalize_simple_expression(tokens)
 
         # 处理带括号的表达式
         # 这里简化处理，实际应该解析表达式树
-        return expr
+        return ''.join(tokens)
 
-    def _normalize_simple_expression(self, expr: str) -> str:
+    def _normalize_simple_expression(self, tokens: Sequence[str]) -> str:
         """规范化简单表达式（无括号）"""
-        operators = []
-        operands = []
-
-        # 分割操作数和运算符
-        tokens = re.split(r'([+\-×÷])', expr)
-
-        i = 0
-        while i < len(tokens):
-            token = tokens[i].strip()
-            if not token:
-                i += 1
-                continue
-
-            if token in ['+', '-', '×', '÷']:
-                operators.append(token)
-            else:
-                operands.append(token)
-            i += 1
+        operators = [token for token in tokens if token in PRIORITY]
+        operands = [token for token in tokens if token not in PRIORITY]
 
         # 对于加法和乘法，排序操作数
         if len(operators) == 1 and operators[0] in ['+', '×']:
             operands.sort()
 
-        # 重新构建表达式
-        result = operands[0]
-        for i in range(len(operators)):
-            result += operators[i] + operands[i + 1]
+        # 重新构建表达式（一次 join，避免逐段拼接字符串）
+        parts = [operands[0]]
+        for operator, operand in zip(operators, operands[1:]):
+            parts.append(operator)
+            parts.append(operand)
+        return ''.join(parts)
 
-        return result
-
-    def validate_constraints(self, expr: str, result: Fraction, max_operators: int = 3) -> bool:
+    def validate_constraints(self, expr: str, result: Fraction, max_operators: int = DEFAULT_MAX_OPERATORS) -> bool:
         """验证表达式约束"""
         # 检查运算符数量
-        operator_count = sum(1 for char in expr if char in ['+', '-', '×', '÷'])
-        if operator_count > max_operators:
+        if not self.within_operator_limit(expr, max_operators):
             return False
 
         # 检查是否重复
         if self.is_duplicate(expr):
+            self.stats.reject(GenerationStats.DUPLICATE)
             return False
 
-        return True
\ No newline at end of file
+        return True
+
+    def within_operator_limit(self, expr: str, max_operators: int = DEFAULT_MAX_OPERATORS) -> bool:
+        """检查运算符数量是否超限"""
+        if count_operators(tokenize(expr)) > max_operators:
+            self.stats.reject(GenerationStats.OPERATOR_LIMIT)
+            return False
+        return True
@@ -0,0 +1,40 @@
+import importlib.util
+from typing import List, Sequence
+
+# numpy 为可选依赖，只检查是否安装；首次批量比较时才导入，避免拖慢每次启动
+HAS_NUMPY = importlib.util.find_spec('numpy') is not None
+
+# 分子、分母绝对值均小于 2**31 时，交叉相乘结果不会超出 int64
+SAFE_LIMIT = 2 ** 31
+
+
+def _column(values: Sequence[int]) -> 'np.ndarray':
+    import numpy as np
+    return np.fromiter(values, dtype=np.int64, count=len(values))
+
+
+def fractions_equal(computed_num: Sequence[int], computed_den: Sequence[int],
+                    expected_num: Sequence[int], expected_den: Sequence[int]) -> 'np.ndarray':
+    """按列交叉相乘比较两组分数，返回布尔掩码；可能溢出的行退回 Python 整数比较"""
+    import numpy as np
+    columns = (computed_num, computed_den, expected_num, expected_den)
+    if all(not column or max(map(abs, column)) < SAFE_LIMIT for column in columns):
+        a, b, c, d = map(_column, columns)
+        return a * d == c * b
+
+    # 存在大数时，只对安全的行做向量化比较，其余行逐个比较
+    safe = [all(abs(column[i]) < SAFE_LIMIT for column in columns) for i in range(len(computed_num))]
+    a, b, c, d = (_column([value if ok else 0 for value, ok in zip(column, safe)]) for column in columns)
+    equal = a * d == c * b
+    for i in np.flatnonzero(~np.array(safe, dtype=bool)):
+        equal[i] = computed_num[i] * expected_den[i] == expected_num[i] * computed_den[i]
+    return equal
+
+
+def split_indices(indices: Sequence[int], equal: 'np.ndarray', error_indices: List[int]):
+    """根据比较掩码得到正确与错误题号（错误题号包含求值失败的题目，保持升序）"""
+    import numpy as np
+    indices = np.asarray(indices, dtype=np.int64)
+    correct = indices[equal]
+    wrong = np.sort(np.concatenate([indices[~equal], np.asarray(error_indices, dtype=np.int64)]))
+    return correct.tolist(), wrong.tolist()